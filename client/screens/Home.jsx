@@ -143,27 +143,14 @@ const Home = () => {
         return { medicines: [] };
       }
 
-      // Use Promise.allSettled to handle partial failures
-      const responses = await Promise.allSettled([
-        axios.get(`${SERVER_URL}/api/user/medicines/today`, {
-          headers: { Authorization: `Bearer ${token}` }
-        }),
-        axios.get(`${SERVER_URL}/api/user/medicines/progress`, {
-          headers: { Authorization: `Bearer ${token}` }
-        }),
-        axios.get(`${SERVER_URL}/api/user/medicines/schedule`, {
-          headers: { Authorization: `Bearer ${token}` }
-        }),
-        axios.get(`${SERVER_URL}/api/user/medicines`, {
-          headers: { Authorization: `Bearer ${token}` }
-        })
-      ]);
+      // Today's list, progress, schedule and all medicines come in one request
+      const response = await axios.get(`${SERVER_URL}/api/user/dashboard`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      const dashboard = response.data;
 
       // Process today's medicines
-      let todayMeds = [];
-      if (responses[0].status === 'fulfilled') {
-        todayMeds = responses[0].value.data.medicines || [];
-      }
+      const todayMeds = dashboard.today_medicines || [];
 
       // Sort medications by time
       todayMeds.sort((a, b) => {
@@ -177,31 +164,13 @@ const Home = () => {
       });
 
       // Process progress data
-      let progressData = { total: 0, completed: 0, progress: 0 };
-      if (responses[1].status === 'fulfilled') {
-        progressData = responses[1].value.data;
-      } else {
-        // Calculate progress from medications if API failed
-        const total = todayMeds.length;
-        const completed = todayMeds.filter(med => med.last_status).length;
-        progressData = {
-          total,
-          completed,
-          progress: total > 0 ? (completed / total) * 100 : 0
-        };
-      }
+      const progressData = dashboard.progress || { total: 0, completed: 0, progress: 0 };
 
       // Process schedule data
-      let scheduleData = {};
-      if (responses[2].status === 'fulfilled') {
-        scheduleData = responses[2].value.data.schedule || {};
-      }
+      const scheduleData = dashboard.schedule || {};
       
       // Process all medicines data and calculate analytics
-      let medicinesWithHistory = [];
-      if (responses[3].status === 'fulfilled') {
-        medicinesWithHistory = responses[3].value.data.medicines || [];
-      }
+      const medicinesWithHistory = dashboard.medicines || [];
       
       // Calculate analytics from the medicine history
       const analyticsResults = calculateAnalytics(medicinesWithHistory);
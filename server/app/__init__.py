@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 import os
 from app.database import init_db, get_db
 from app.utils.json_utils import MongoJSONProvider
+from app.utils.cache import init_cache
+from app.utils.rate_limit import limiter
 
 load_dotenv()
 
@@ -19,6 +21,8 @@ def create_app(config_name='development'):
     CORS(app)
     
     init_db(app)
+    init_cache(app)
+    limiter.init_app(app)
     
     # Import routes
     from app.routes.auth_routes import auth_bp
@@ -7,9 +7,74 @@ class Config:
     
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
     DB_NAME = os.getenv('DB_NAME', 'smart_medicine_app')
+    # Startup fails when the unique dose completion index cannot be built
+    DOSE_COMPLETION_INDEX_REQUIRED = True
     
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt_dev_secret')
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600)) 
     JWT_REFRESH_TOKEN_EXPIRES = int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 2592000))  
+    # Number of verified tokens remembered, so repeated requests skip the signature check
+    JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 10000))
+    # Seconds the authenticated user loaded by auth.token_required is cached
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 30))
+    # Seconds until tokens revoked by another worker or node are rejected here
+    REVOCATION_SYNC_INTERVAL = int(os.getenv('REVOCATION_SYNC_INTERVAL', 5))
 
-    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
\ No newline at end of file
+    # Registration only checks email syntax unless deliverability checks are
+    # enabled, their DNS result is then reused per domain for the TTL in seconds
+    EMAIL_CHECK_DELIVERABILITY = os.getenv('EMAIL_CHECK_DELIVERABILITY', 'False') == 'True'
+    EMAIL_DOMAIN_CACHE_TTL = int(os.getenv('EMAIL_DOMAIN_CACHE_TTL', 86400))
+
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    # Worker processes that run bcrypt (0 runs it in the request thread), how
+    # many operations may be in progress before new ones are refused, and how
+    # long a request waits for its result
+    BCRYPT_POOL_PROCESSES = int(os.getenv('BCRYPT_POOL_PROCESSES', 2))
+    BCRYPT_POOL_QUEUE = int(os.getenv('BCRYPT_POOL_QUEUE', 64))
+    BCRYPT_POOL_TIMEOUT = int(os.getenv('BCRYPT_POOL_TIMEOUT', 10))
+
+    # Cache for computed views, profiles and principals: 'memory' is private to
+    # each worker process, 'sqlite' is shared by all workers on the host, in a
+    # database only the app's user can open
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_PATH = os.getenv('CACHE_PATH', os.path.join(
+        os.getenv('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+        'smart_medicine_app',
+        'cache.sqlite3'
+    ))
+    CACHE_SIZE = int(os.getenv('CACHE_SIZE', 2048))
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 300))
+
+    # Encode JSON responses with orjson when it is installed. Faster, but
+    # compact and with other float and non-ASCII formatting than the stdlib
+    # output existing clients get by default
+    JSON_USE_ORJSON = os.getenv('JSON_USE_ORJSON', 'False') == 'True'
+
+    # Chat history sent with each prompt: at most this many of the latest
+    # messages within an estimated token budget. A conversation ends after
+    # CHAT_MEMORY_IDLE_TTL idle seconds, each worker holds at most
+    # CHAT_MEMORY_MAX_SESSIONS of them, and all messages are kept in a capped
+    # collection of CHAT_HISTORY_COLLECTION_SIZE bytes
+    CHAT_MEMORY_MAX_MESSAGES = int(os.getenv('CHAT_MEMORY_MAX_MESSAGES', 20))
+    CHAT_MEMORY_TOKEN_BUDGET = int(os.getenv('CHAT_MEMORY_TOKEN_BUDGET', 2000))
+    CHAT_MEMORY_IDLE_TTL = int(os.getenv('CHAT_MEMORY_IDLE_TTL', 1800))
+    CHAT_MEMORY_MAX_SESSIONS = int(os.getenv('CHAT_MEMORY_MAX_SESSIONS', 1000))
+    CHAT_HISTORY_COLLECTION_SIZE = int(os.getenv('CHAT_HISTORY_COLLECTION_SIZE', 64 * 1024 * 1024))
+
+    # Responses to chat prompts without prior conversation are reused for
+    # CHAT_CACHE_TTL seconds, each worker keeps CHAT_CACHE_SIZE of them in memory
+    CHAT_CACHE_ENABLED = os.getenv('CHAT_CACHE_ENABLED', 'True') == 'True'
+    CHAT_CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', 86400))
+    CHAT_CACHE_SIZE = int(os.getenv('CHAT_CACHE_SIZE', 1000))
+
+    # Sliding window rate limits per client address: 'memory' counts in each
+    # worker process, 'mongo' shares the counts across all workers and nodes.
+    # Routes with their own limits ignore their blueprint's policy, routes of
+    # blueprints without a policy get the default.
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True') == 'True'
+    RATELIMIT_STORAGE = os.getenv('RATELIMIT_STORAGE', 'memory')
+    RATELIMIT_DEFAULT = os.getenv('RATELIMIT_DEFAULT', '120 per minute')
+    RATELIMIT_POLICIES = {
+        'auth': os.getenv('RATELIMIT_AUTH', '200 per day; 50 per hour'),
+        'chat': os.getenv('RATELIMIT_CHAT', '30 per minute')
+    }
\ No newline at end of file
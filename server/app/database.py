@@ -1,4 +1,5 @@
 from pymongo import MongoClient
+from pymongo.errors import CollectionInvalid, OperationFailure
 import os
 
 mongo_client = None
@@ -16,10 +17,64 @@ def init_db(app):
     db.users.create_index('email', unique=True)
     db.users.create_index('username', unique=True)
     
+    # completed keeps the key pattern distinct from unique_dose_completion,
+    # older servers refuse two indexes with the same key
+    db.dose_events.create_index([('user_id', 1), ('medicine_id', 1), ('date', 1), ('completed', 1)])
+    db.dose_events.create_index([('user_id', 1), ('date', 1)])
+    db.dose_events.create_index([('user_id', 1), ('version', 1)])
+    db.dose_events.create_index(
+        [('user_id', 1), ('pending', 1)],
+        partialFilterExpression={'pending': True}
+    )
+    
+    # Rate limit windows are removed once they can no longer be counted
+    db.rate_limits.create_index('expires_at', expireAfterSeconds=0)
+    
+    # Revocations are removed once the tokens they revoke have expired
+    db.revoked_tokens.create_index('expires_at', expireAfterSeconds=0)
+    db.revoked_tokens.create_index('revoked_at')
+    
+    # Chat history is capped in size, the oldest messages are dropped first
+    if 'chat_messages' not in db.list_collection_names():
+        try:
+            db.create_collection(
+                'chat_messages',
+                capped=True,
+                size=app.config.get('CHAT_HISTORY_COLLECTION_SIZE')
+            )
+        except CollectionInvalid:
+            pass  # Created by another worker meanwhile
+    db.chat_messages.create_index([('user_id', 1), ('created_at', 1)])
+    db.chat_responses.create_index('expires_at', expireAfterSeconds=0)
+    
+    # At most one completed dose event per medicine and day, mark_taken relies
+    # on it so the app does not start without it
+    try:
+        create_dose_completion_index(db)
+    except OperationFailure as e:
+        if app.config.get('DOSE_COMPLETION_INDEX_REQUIRED', True):
+            raise RuntimeError(
+                f"Could not create unique dose completion index ({e}), "
+                "run migrate_dose_history.py to remove duplicate completions"
+            )
+        app.logger.warning(f"Unique dose completion index is missing ({e})")
+    
     app.logger.info(f"Connected to MongoDB: {db_name}")
     
     return db
 
+def create_dose_completion_index(db):
+    # Replaces the non-unique index with the same key from earlier versions
+    if 'user_id_1_medicine_id_1_date_1' in db.dose_events.index_information():
+        db.dose_events.drop_index('user_id_1_medicine_id_1_date_1')
+    
+    db.dose_events.create_index(
+        [('user_id', 1), ('medicine_id', 1), ('date', 1)],
+        name='unique_dose_completion',
+        unique=True,
+        partialFilterExpression={'completed': True}
+    )
+
 def get_db():
     global db
     return db
@@ -0,0 +1,43 @@
+from app.database import get_db
+from bson.objectid import ObjectId
+from datetime import datetime
+
+class ChatMessage:
+    """
+    Chat message model class to interact with MongoDB chat_messages collection
+
+    The collection is capped, so the oldest messages of all users are dropped
+    once it reaches CHAT_HISTORY_COLLECTION_SIZE bytes.
+    """
+
+    @staticmethod
+    def add_exchange(user_id, prompt, response):
+        """
+        Record a prompt and the response to it
+
+        Returns the inserted messages with their _id
+        """
+        db = get_db()
+        now = datetime.utcnow()
+        messages = [
+            {'user_id': ObjectId(user_id), 'role': 'human', 'text': prompt, 'created_at': now},
+            {'user_id': ObjectId(user_id), 'role': 'ai', 'text': response, 'created_at': now}
+        ]
+
+        db.chat_messages.insert_many(messages, ordered=True)
+        return messages
+
+    @staticmethod
+    def find_recent(user_id, since, limit):
+        """
+        Get the latest messages of a user created since a time, oldest first
+        """
+        db = get_db()
+
+        messages = list(db.chat_messages.find(
+            {'user_id': ObjectId(user_id), 'created_at': {'$gte': since}},
+            {'role': 1, 'text': 1, 'created_at': 1}
+        ).sort([('created_at', -1), ('_id', -1)]).limit(limit))
+
+        messages.reverse()
+        return messages
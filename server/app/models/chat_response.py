@@ -0,0 +1,40 @@
+from app.database import get_db
+from datetime import datetime
+
+class ChatResponse:
+    """
+    Chat response model class to interact with MongoDB chat_responses collection
+
+    Holds answers to context-free chat prompts by the hash of the normalized
+    prompt, the TTL index on expires_at removes them.
+    """
+
+    @staticmethod
+    def find(key):
+        """
+        Get the cached response document of a key if it has not expired
+        """
+        db = get_db()
+
+        return db.chat_responses.find_one(
+            {'_id': key, 'expires_at': {'$gt': datetime.utcnow()}},
+            {'response': 1, 'expires_at': 1}
+        )
+
+    @staticmethod
+    def save(key, prompt, response, expires_at):
+        """
+        Store the response to a normalized prompt until it expires
+        """
+        db = get_db()
+
+        db.chat_responses.update_one(
+            {'_id': key},
+            {'$set': {
+                'prompt': prompt,
+                'response': response,
+                'created_at': datetime.utcnow(),
+                'expires_at': expires_at
+            }},
+            upsert=True
+        )
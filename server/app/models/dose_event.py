@@ -0,0 +1,367 @@
+from app.database import get_db
+from bson.objectid import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from datetime import datetime
+
+class DoseEvent:
+    """
+    Dose event model class to interact with MongoDB dose_events collection
+
+    Every time a user marks a medicine as taken (or not taken) one document is
+    written here instead of being pushed onto the embedded medicines[].history
+    array, so the user document stays small no matter how old the account is.
+    """
+
+    @staticmethod
+    def create(user_id, medicine_id, completed, date=None, time=None):
+        """
+        Record a dose event for a medicine
+        """
+        db = get_db()
+        now = datetime.now()
+
+        event = {
+            'user_id': ObjectId(user_id),
+            'medicine_id': ObjectId(medicine_id),
+            'date': date or now.strftime('%Y-%m-%d'),
+            'time': time or now.strftime('%H:%M'),
+            'completed': completed,
+            'created_at': datetime.utcnow(),
+            # Until set_version runs the event is returned by every delta sync
+            'pending': True
+        }
+
+        result = db.dose_events.insert_one(event)
+        return str(result.inserted_id)
+
+    @staticmethod
+    def mark_taken(user_id, medicine_id, date, time):
+        """
+        Record that a medicine was taken on a date, at most once per day
+
+        The upsert only inserts when no completed event exists for the day, and
+        the partial unique index on completed events makes concurrent requests
+        fail instead of inserting a duplicate.
+
+        Returns:
+            str: The new event ID, or None if the medicine was already taken that day
+        """
+        db = get_db()
+
+        try:
+            result = db.dose_events.update_one(
+                {
+                    'user_id': ObjectId(user_id),
+                    'medicine_id': ObjectId(medicine_id),
+                    'date': date,
+                    'completed': True
+                },
+                {
+                    '$setOnInsert': {
+                        'time': time,
+                        'created_at': datetime.utcnow(),
+                        'pending': True
+                    }
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+
+        if result.upserted_id is None:
+            return None
+
+        return str(result.upserted_id)
+
+    @staticmethod
+    def record_many(user_id, doses):
+        """
+        Record many dose events with a single bulk write
+
+        Doses are {'medicine_id', 'completed', 'date', 'time'}. Taken doses are
+        upserted like mark_taken, so at most one is recorded per medicine and day.
+
+        Returns:
+            list: The new event ID of each dose, or None if it was already taken that day
+        """
+        db = get_db()
+        now = datetime.now()
+        created_at = datetime.utcnow()
+        operations = []
+        event_ids = []
+
+        for dose in doses:
+            event = {
+                'user_id': ObjectId(user_id),
+                'medicine_id': ObjectId(dose['medicine_id']),
+                'date': dose.get('date') or now.strftime('%Y-%m-%d'),
+                'completed': dose['completed']
+            }
+            fields = {
+                'time': dose.get('time') or now.strftime('%H:%M'),
+                'created_at': created_at,
+                'pending': True
+            }
+
+            if dose['completed']:
+                operations.append(UpdateOne(event, {'$setOnInsert': fields}, upsert=True))
+                event_ids.append(None)
+            else:
+                event_id = ObjectId()
+                operations.append(InsertOne(dict(event, _id=event_id, **fields)))
+                event_ids.append(event_id)
+
+        if not operations:
+            return []
+
+        try:
+            upserted = db.dose_events.bulk_write(operations, ordered=False).upserted_ids
+        except BulkWriteError as e:
+            # Taken doses recorded concurrently hit the unique index
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+            upserted = {item['index']: item['_id'] for item in e.details.get('upserted', [])}
+
+        for index, dose in enumerate(doses):
+            if dose['completed']:
+                event_ids[index] = upserted.get(index)
+
+        return [str(event_id) if event_id else None for event_id in event_ids]
+
+    @staticmethod
+    def set_versions(event_ids, version):
+        """
+        Stamp many dose events with the user data_version they were recorded at
+        """
+        db = get_db()
+        db.dose_events.update_many(
+            {'_id': {'$in': [ObjectId(event_id) for event_id in event_ids]}},
+            {'$set': {'version': version}, '$unset': {'pending': ''}}
+        )
+
+    @staticmethod
+    def set_version(event_id, version):
+        """
+        Stamp a dose event with the user data_version it was recorded at
+        """
+        db = get_db()
+        db.dose_events.update_one(
+            {'_id': ObjectId(event_id)},
+            {'$set': {'version': version}, '$unset': {'pending': ''}}
+        )
+
+    @staticmethod
+    def find_changed(user_id, since_version, start_date=None):
+        """
+        Retrieve dose events recorded after a user data_version, optionally
+        only those on or after a YYYY-MM-DD date
+
+        Events still waiting for their version stamp are included as well, so an
+        event is never missed by a client syncing while it is being written.
+        """
+        db = get_db()
+        query = {
+            'user_id': ObjectId(user_id),
+            '$or': [
+                {'version': {'$gt': since_version}},
+                {'pending': True}
+            ]
+        }
+
+        if since_version <= 0:
+            # Events from before versioning have no version at all
+            query.pop('$or')
+
+        if start_date is not None:
+            query['date'] = {'$gte': start_date}
+
+        return list(db.dose_events.find(
+            query,
+            {'user_id': 0, 'created_at': 0, 'pending': 0}
+        ).sort([('date', 1), ('time', 1)]))
+
+    @staticmethod
+    def find_in_range(user_id, start_date, end_date, medicine_id=None, completed=None):
+        """
+        Retrieve a user's dose events between two YYYY-MM-DD dates (inclusive)
+        """
+        db = get_db()
+        query = {
+            'user_id': ObjectId(user_id),
+            'date': {'$gte': start_date, '$lte': end_date}
+        }
+
+        if medicine_id is not None:
+            query['medicine_id'] = ObjectId(medicine_id)
+
+        if completed is not None:
+            query['completed'] = completed
+
+        return db.dose_events.find(
+            query,
+            {'_id': 0, 'medicine_id': 1, 'date': 1, 'time': 1, 'completed': 1}
+        ).sort([('date', 1), ('time', 1)])
+
+    @staticmethod
+    def get_history(user_id, start_date, end_date):
+        """
+        Get dose history grouped by medicine, shaped like the legacy embedded history
+
+        Returns:
+            dict: Medicine id as str -> list of {'date', 'time', 'completed'}
+        """
+        return DoseEvent.group_by_medicine(DoseEvent.find_in_range(user_id, start_date, end_date))
+
+    @staticmethod
+    def group_by_medicine(events):
+        """
+        Group dose events by medicine, shaped like the legacy embedded history
+
+        Returns:
+            dict: Medicine id as str -> list of {'date', 'time', 'completed'}
+        """
+        history = {}
+        for event in events:
+            history.setdefault(str(event['medicine_id']), []).append({
+                'date': event['date'],
+                'time': event.get('time'),
+                'completed': event.get('completed', False)
+            })
+
+        return history
+
+    @staticmethod
+    def delete(event_id):
+        """
+        Remove a single dose event
+        """
+        db = get_db()
+        result = db.dose_events.delete_one({'_id': ObjectId(event_id)})
+        return result.deleted_count > 0
+
+    @staticmethod
+    def delete_many(event_ids):
+        """
+        Remove dose events by their IDs
+        """
+        db = get_db()
+        result = db.dose_events.delete_many({'_id': {'$in': [ObjectId(event_id) for event_id in event_ids]}})
+        return result.deleted_count
+
+    @staticmethod
+    def delete_for_medicine(user_id, medicine_id):
+        """
+        Remove all dose events of a deleted medicine
+        """
+        db = get_db()
+        result = db.dose_events.delete_many({
+            'user_id': ObjectId(user_id),
+            'medicine_id': ObjectId(medicine_id)
+        })
+
+        return result.deleted_count
+
+    @staticmethod
+    def remove_duplicate_completions():
+        """
+        Keep only the first completed event per medicine and day
+
+        Needed before the unique index on completed events can be built over
+        data migrated from embedded history, which allowed duplicates.
+
+        Returns:
+            int: Number of dose events removed
+        """
+        db = get_db()
+        duplicates = db.dose_events.aggregate([
+            {'$match': {'completed': True}},
+            {'$sort': {'created_at': 1}},
+            {'$group': {
+                '_id': {'user_id': '$user_id', 'medicine_id': '$medicine_id', 'date': '$date'},
+                'ids': {'$push': '$_id'},
+                'count': {'$sum': 1}
+            }},
+            {'$match': {'count': {'$gt': 1}}}
+        ], allowDiskUse=True)
+
+        removed = 0
+        for duplicate in duplicates:
+            result = db.dose_events.delete_many({'_id': {'$in': duplicate['ids'][1:]}})
+            removed += result.deleted_count
+
+        return removed
+
+    @staticmethod
+    def migrate_embedded_history(user_id=None):
+        """
+        Move medicines[].history entries from user documents into dose_events
+
+        Each medicine's history is inserted into dose_events and then unset from
+        the user document, so medicines that were already migrated are skipped
+        when the command is run again.
+
+        Args:
+            user_id: Only migrate this user when given, otherwise every user
+
+        Returns:
+            tuple: (users migrated, dose events inserted)
+        """
+        db = get_db()
+        query = {'medicines.history.0': {'$exists': True}}
+        if user_id is not None:
+            query['_id'] = ObjectId(user_id)
+
+        users_migrated = 0
+        events_inserted = 0
+
+        for user in db.users.find(query, {'medicines._id': 1, 'medicines.history': 1}):
+            for medicine in user.get('medicines', []):
+                history = medicine.get('history') or []
+                if '_id' not in medicine or not history:
+                    continue
+
+                events = []
+                for entry in history:
+                    if not entry.get('date'):
+                        continue
+                    events.append({
+                        'user_id': user['_id'],
+                        'medicine_id': medicine['_id'],
+                        'date': entry['date'],
+                        'time': entry.get('time'),
+                        'completed': entry.get('completed', False),
+                        'created_at': entry.get('timestamp') or datetime.utcnow()
+                    })
+
+                if events:
+                    try:
+                        db.dose_events.insert_many(events, ordered=False)
+                        events_inserted += len(events)
+                    except BulkWriteError as e:
+                        # Repeated "taken" entries for a day hit the unique index
+                        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                            raise
+                        events_inserted += e.details.get('nInserted', 0)
+
+                db.users.update_one(
+                    {'_id': user['_id'], 'medicines._id': medicine['_id']},
+                    {'$unset': {'medicines.$.history': ''}}
+                )
+
+            users_migrated += 1
+
+        return users_migrated, events_inserted
+
+"""
+Example Dose Event Schema:
+{
+    "_id": ObjectId(),
+    "user_id": ObjectId(),
+    "medicine_id": ObjectId(),
+    "date": "2025-05-01",  # YYYY-MM-DD, local date the dose belongs to
+    "time": "08:03",  # HH:MM, local time the dose was logged
+    "completed": true,
+    "created_at": datetime
+}
+"""
@@ -0,0 +1,53 @@
+from app.database import get_db
+from datetime import datetime
+
+class RevokedToken:
+    """
+    Revoked token model class to interact with MongoDB revoked_tokens collection
+
+    A document either revokes a single token by its jti, or every token of a
+    user issued before a time. Documents are only needed until the tokens they
+    revoke would have expired anyway, the TTL index on expires_at removes them.
+    """
+
+    @staticmethod
+    def revoke_token(jti, user_id, expires_at):
+        """
+        Revoke a single token until it expires
+        """
+        db = get_db()
+
+        db.revoked_tokens.update_one(
+            {'_id': jti},
+            {
+                '$set': {'revoked_at': datetime.utcnow()},
+                '$setOnInsert': {'user_id': str(user_id), 'expires_at': expires_at}
+            },
+            upsert=True
+        )
+
+    @staticmethod
+    def revoke_user(user_id, issued_before, expires_at):
+        """
+        Revoke every token of a user issued before a Unix time
+        """
+        db = get_db()
+
+        db.revoked_tokens.update_one(
+            {'_id': f'user:{user_id}'},
+            {
+                '$max': {'issued_before': issued_before, 'expires_at': expires_at},
+                '$set': {'user_id': str(user_id), 'revoked_at': datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+    @staticmethod
+    def find_since(since=None):
+        """
+        Get the revocations made since a time, or all of them
+        """
+        db = get_db()
+
+        query = {'revoked_at': {'$gte': since}} if since else {}
+        return list(db.revoked_tokens.find(query, {'revoked_at': 0}))
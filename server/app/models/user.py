@@ -1,12 +1,43 @@
 from app.database import get_db
+from app.models.dose_event import DoseEvent
+from app.utils.recurrence import cache_recurrence
+from app.utils.cache import get_cache
 from bson.objectid import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument
 
 class User:
     """
     User model class to interact with MongoDB users collection
     """
     
+    # Profile fields returned to the client: no password hash, no medicines and
+    # no delta sync bookkeeping
+    PROFILE_PROJECTION = {'password': 0, 'medicines': 0, 'data_version': 0, 'field_versions': 0, 'tombstones': 0}
+    
+    # Fields maintained by the model itself that clients can never write
+    INTERNAL_FIELDS = ('_id', 'password', 'medicines', 'data_version', 'field_versions', 'tombstones')
+    
+    # Fields needed to identify the authenticated user on a request
+    PRINCIPAL_PROJECTION = {
+        'username': 1,
+        'email': 1,
+        'first_name': 1,
+        'last_name': 1,
+        'onboarding_complete': 1,
+        'onboarding_step': 1
+    }
+    
+    # Fields needed to authenticate a login attempt
+    LOGIN_PROJECTION = dict(PRINCIPAL_PROJECTION, password=1)
+    
+    # The data_version a versioned write moves to, evaluated by the server in
+    # the update pipeline. Documents from before data_version count as 0.
+    NEXT_VERSION = {'$add': [{'$ifNull': ['$data_version', 0]}, 1]}
+    
+    # Number of deletions remembered for delta sync
+    TOMBSTONE_LIMIT = 500
+    
     @staticmethod
     def create(user_data):
         """
@@ -23,184 +54,564 @@ class User:
         # Initialize empty medicines array
         user_data['medicines'] = []
         
-        # Insert user and return the generated ID
+        # Bumped by every write, used for conditional GETs and delta sync
+        user_data['data_version'] = 1
+        
+        # Insert user and return the generated ID, raises DuplicateKeyError
+        # when the email or username is taken
         result = db.users.insert_one(user_data)
         return str(result.inserted_id)
     
     @staticmethod
-    def get_by_id(user_id):
+    def duplicate_key_field(error):
+        """
+        Get the unique field ('email' or 'username') a DuplicateKeyError is about, or None
+        """
+        key_pattern = (error.details or {}).get('keyPattern') or {}
+        for field in ('email', 'username'):
+            if field in key_pattern:
+                return field
+        
+        # Servers that do not report keyPattern name the index in the message
+        message = str(error)
+        for field in ('email', 'username'):
+            if f'index: {field}_' in message:
+                return field
+        
+        return None
+    
+    @staticmethod
+    def get_by_id(user_id, projection=None):
         """
-        Retrieve a user by their ID
+        Retrieve a user by their ID, optionally limited to a projection
         """
         db = get_db()
-        user = db.users.find_one({'_id': ObjectId(user_id)})
+        user = db.users.find_one({'_id': ObjectId(user_id)}, projection)
         return user
     
     @staticmethod
-    def get_by_email(email):
+    def get_by_email(email, projection=None):
+        """
+        Retrieve a user by their email, optionally limited to a projection
+        """
+        db = get_db()
+        return db.users.find_one({'email': email}, projection)
+    
+    @staticmethod
+    def get_by_username(username, projection=None):
+        """
+        Retrieve a user by their username, optionally limited to a projection
+        """
+        db = get_db()
+        return db.users.find_one({'username': username}, projection)
+    
+    @staticmethod
+    def get_data_version(user_id):
+        """
+        Retrieve only the user's data version, which every write increments
+        
+        Returns:
+            int: The data version, or None if the user does not exist
+        """
+        user = User.get_by_id(user_id, {'data_version': 1})
+        
+        if not user:
+            return None
+        
+        return user.get('data_version', 0)
+    
+    @staticmethod
+    def has_medicine(user_id, medicine_id):
+        """
+        Check whether a user has a medicine, without loading either
+        """
+        db = get_db()
+        user = db.users.find_one(
+            {'_id': ObjectId(user_id), 'medicines._id': ObjectId(medicine_id)},
+            {'_id': 1}
+        )
+        return user is not None
+    
+    @staticmethod
+    def get_profile(user_id):
+        """
+        Retrieve a user's profile without password hash or medicines
+        """
+        return User.get_by_id(user_id, User.PROFILE_PROJECTION)
+    
+    @staticmethod
+    def get_principal(user_id):
+        """
+        Retrieve only the identity fields of a user
+        """
+        return User.get_by_id(user_id, User.PRINCIPAL_PROJECTION)
+    
+    @staticmethod
+    def get_sync_state(user_id):
+        """
+        Retrieve everything a delta sync needs: profile fields, medicines
+        without embedded history and the version bookkeeping
+        """
+        return User.get_by_id(user_id, {'password': 0, 'medicines.history': 0})
+    
+    @staticmethod
+    def get_medicines(user_id, history_start=None, history_end=None):
+        """
+        Retrieve a user's medicines without loading the rest of the document
+        
+        Any history still embedded in a medicine is dropped, unless a
+        history_start/history_end (YYYY-MM-DD) window is given, in which case
+        only the entries inside that window are returned.
+        
+        Returns:
+            list: The medicines, or None if the user does not exist
+        """
+        user = User._aggregate_medicines(
+            {'_id': ObjectId(user_id)},
+            None,
+            history_start,
+            history_end
+        )
+        
+        if user is None:
+            return None
+        
+        return user.get('medicines', [])
+    
+    @staticmethod
+    def get_medicine(user_id, medicine_id, history_start=None, history_end=None):
+        """
+        Retrieve a single medicine of a user, see get_medicines for the history window
+        
+        Returns:
+            dict: The medicine, or None if the user or medicine does not exist
+        """
+        user = User._aggregate_medicines(
+            {'_id': ObjectId(user_id), 'medicines._id': ObjectId(medicine_id)},
+            ObjectId(medicine_id),
+            history_start,
+            history_end
+        )
+        
+        if not user or not user.get('medicines'):
+            return None
+        
+        return user['medicines'][0]
+    
+    @staticmethod
+    def _aggregate_medicines(match, medicine_id, history_start, history_end):
         """
-        Retrieve a user by their email
+        Run the projection pipeline shared by get_medicines and get_medicine
         """
         db = get_db()
-        return db.users.find_one({'email': email})
+        
+        medicines = {'$ifNull': ['$medicines', []]}
+        if medicine_id is not None:
+            medicines = {
+                '$filter': {
+                    'input': medicines,
+                    'as': 'medicine',
+                    'cond': {'$eq': ['$$medicine._id', medicine_id]}
+                }
+            }
+        
+        pipeline = [
+            {'$match': match},
+            {'$project': {'medicines': medicines}}
+        ]
+        
+        if history_start is None and history_end is None:
+            pipeline.append({'$project': {'medicines.history': 0}})
+        else:
+            date_conditions = []
+            if history_start is not None:
+                date_conditions.append({'$gte': ['$$entry.date', history_start]})
+            if history_end is not None:
+                date_conditions.append({'$lte': ['$$entry.date', history_end]})
+            
+            pipeline.append({'$addFields': {'medicines': {'$map': {
+                'input': '$medicines',
+                'as': 'medicine',
+                'in': {'$mergeObjects': ['$$medicine', {'history': {'$filter': {
+                    'input': {'$ifNull': ['$$medicine.history', []]},
+                    'as': 'entry',
+                    'cond': {'$and': date_conditions}
+                }}}]}
+            }}}})
+        
+        return next(db.users.aggregate(pipeline), None)
     
     @staticmethod
-    def get_by_username(username):
+    def _versioned_update(user_id, build_fields, query=None):
         """
-        Retrieve a user by their username
+        Apply an update that moves the user's data_version forward by one
+        
+        build_fields(version) returns the fields to set, given the new version
+        as an aggregation expression, so that changed records can be stamped
+        with it for delta sync. The fields are applied as one update pipeline
+        stage, so the new version is read and written atomically in a single
+        round trip. Values given by callers must be wrapped with _literal.
+        
+        Args:
+            user_id: The ID of the user
+            build_fields: Callable taking the new version expression, returning a $set stage
+            query: Extra conditions the user document has to match
+        
+        Returns:
+            int: The new data version, or None if the user or query did not match
         """
         db = get_db()
-        return db.users.find_one({'username': username})
+        
+        fields = build_fields(User.NEXT_VERSION)
+        fields['data_version'] = User.NEXT_VERSION
+        
+        user = db.users.find_one_and_update(
+            dict(query or {}, _id=ObjectId(user_id)),
+            [{'$set': fields}],
+            projection={'data_version': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        
+        if user is None:
+            return None
+        
+        # Every write goes through here, so cached views of the user end here too
+        get_cache().invalidate(user_id)
+        return user['data_version']
+    
+    @staticmethod
+    def _literal(value):
+        """
+        Wrap a value so an update pipeline does not read it as an expression
+        """
+        return {'$literal': value}
+    
+    @staticmethod
+    def _literals(values):
+        """
+        Wrap every value of a dict with _literal
+        """
+        return {key: User._literal(value) for key, value in values.items()}
+    
+    @staticmethod
+    def _field_versions(fields, version):
+        """
+        Build the $set entries recording the version each profile field changed at
+        """
+        return {f'field_versions.{field}': version for field in fields}
+    
+    @staticmethod
+    def _update_medicines(fields_by_id):
+        """
+        Build the $set entry merging fields into medicines by their ID
+        """
+        branches = [
+            {'case': {'$eq': ['$$medicine._id', ObjectId(medicine_id)]}, 'then': {'$mergeObjects': ['$$medicine', fields]}}
+            for medicine_id, fields in fields_by_id.items()
+        ]
+        
+        return {'medicines': {'$map': {
+            'input': '$medicines',
+            'as': 'medicine',
+            'in': {'$switch': {'branches': branches, 'default': '$$medicine'}}
+        }}}
+    
+    @staticmethod
+    def invalid_fields(fields):
+        """
+        Get the keys that cannot be written as top-level fields: paths into
+        other fields, operators and fields maintained by the model
+        """
+        return [
+            field for field in fields
+            if '.' in field or field.startswith('$') or field.split('.')[0] in User.INTERNAL_FIELDS
+        ]
     
     @staticmethod
     def update(user_id, update_data):
         """
         Update a user's information
+        
+        Raises ValueError for keys listed by invalid_fields
         """
-        db = get_db()
+        if User.invalid_fields(update_data):
+            raise ValueError(f"Invalid fields: {', '.join(User.invalid_fields(update_data))}")
+        
         update_data['updated_at'] = datetime.utcnow()
         
-        result = db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$set': update_data}
+        version = User._versioned_update(
+            user_id,
+            lambda version: dict(User._literals(update_data), **User._field_versions(update_data, version))
+        )
+        
+        return version is not None
+    
+    @staticmethod
+    def update_profile(user_id, profile_data):
+        """
+        Update profile fields, only writing when at least one field differs
+        
+        Returns:
+            bool: True if the profile changed, False if nothing changed or the user does not exist
+        
+        Raises ValueError for keys listed by invalid_fields
+        """
+        if User.invalid_fields(profile_data):
+            raise ValueError(f"Invalid fields: {', '.join(User.invalid_fields(profile_data))}")
+        
+        if not profile_data:
+            return False
+        
+        version = User._versioned_update(
+            user_id,
+            lambda version: dict(User._literals(profile_data), **User._field_versions(profile_data, version)),
+            {'$or': [{key: {'$ne': value}} for key, value in profile_data.items()]}
         )
         
-        return result.modified_count > 0
+        return version is not None
     
     @staticmethod
     def update_onboarding_status(user_id, step, complete=False):
         """
         Update user's onboarding status
         """
-        db = get_db()
         update_data = {
             'onboarding_step': step,
             'onboarding_complete': complete,
             'updated_at': datetime.utcnow()
         }
         
-        result = db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$set': update_data}
+        version = User._versioned_update(
+            user_id,
+            lambda version: dict(User._literals(update_data), **User._field_versions(update_data, version))
         )
         
-        return result.modified_count > 0
+        return version is not None
+    
+    @staticmethod
+    def update_password(user_id, hashed_password, current_hash):
+        """
+        Replace a user's password hash, if it is still current_hash
+        
+        Used to rehash at a new cost on login, so a password changed in the
+        meantime is never overwritten with the old one.
+        """
+        version = User._versioned_update(
+            user_id,
+            lambda version: {'password': User._literal(hashed_password)},
+            {'password': current_hash}
+        )
+        
+        return version is not None
         
     @staticmethod
     def add_medicine(user_id, medicine_data):
         """
         Add a new medicine to user's medicine list
         """
-        db = get_db()
-        
         # Add IDs and timestamps
         medicine_data['_id'] = ObjectId()
-        medicine_data['created_at'] = datetime.utcnow()
-        medicine_data['updated_at'] = datetime.utcnow()
-        medicine_data['history'] = []
+        medicine_data['created_at'] = datetime.now()
+        medicine_data['updated_at'] = datetime.now()
         
-        result = db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$push': {'medicines': medicine_data}}
-        )
+        def build_fields(version):
+            medicine = {'$mergeObjects': [User._literal(medicine_data), {'version': version}]}
+            return {'medicines': {'$concatArrays': [{'$ifNull': ['$medicines', []]}, [medicine]]}}
+        
+        version = User._versioned_update(user_id, build_fields)
         
-        return result.modified_count > 0, str(medicine_data['_id'])
+        if version is not None:
+            medicine_data['version'] = version
+            cache_recurrence(medicine_data)
+        
+        return version is not None, str(medicine_data['_id'])
         
     @staticmethod
     def update_medicine(user_id, medicine_id, update_data):
         """
         Update an existing medicine
         """
-        db = get_db()
-        update_data['updated_at'] = datetime.utcnow()
+        update_data['updated_at'] = datetime.now()
         
-        # Create update fields
-        update_fields = {}
-        for key, value in update_data.items():
-            update_fields[f'medicines.$.{key}'] = value
-        
-        result = db.users.update_one(
-            {
-                '_id': ObjectId(user_id),
-                'medicines._id': ObjectId(medicine_id)
-            },
-            {'$set': update_fields}
+        version = User._versioned_update(
+            user_id,
+            lambda version: User._update_medicines({medicine_id: dict(User._literals(update_data), version=version)}),
+            {'medicines._id': ObjectId(medicine_id)}
         )
         
-        return result.modified_count > 0
+        return version is not None
         
     @staticmethod
     def delete_medicine(user_id, medicine_id):
         """
-        Remove a medicine from user's medicine list
+        Remove a medicine from user's medicine list, leaving a tombstone for delta sync
         """
-        db = get_db()
+        def build_fields(version):
+            tombstone = {'type': 'medicine', 'id': User._literal(str(medicine_id)), 'version': version}
+            return {
+                'medicines': {'$filter': {
+                    'input': '$medicines',
+                    'as': 'medicine',
+                    'cond': {'$ne': ['$$medicine._id', ObjectId(medicine_id)]}
+                }},
+                'tombstones': {'$slice': [
+                    {'$concatArrays': [{'$ifNull': ['$tombstones', []]}, [tombstone]]},
+                    -User.TOMBSTONE_LIMIT
+                ]}
+            }
         
-        result = db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$pull': {'medicines': {'_id': ObjectId(medicine_id)}}}
+        version = User._versioned_update(
+            user_id,
+            build_fields,
+            {'medicines._id': ObjectId(medicine_id)}
         )
         
-        return result.modified_count > 0
+        if version is not None:
+            DoseEvent.delete_for_medicine(user_id, medicine_id)
+        
+        return version is not None
         
     @staticmethod
-    def update_medicine_status(user_id, medicine_id, completed):
+    def update_medicine_status(user_id, medicine_id, completed, date=None, time=None):
         """
         Mark a medicine as taken or not taken
         
+        Marking a medicine as taken is idempotent per day: the dose event is
+        upserted against a unique index, so repeated or concurrent requests
+        record a single event and only the first one updates the medicine.
+        
         Args:
             user_id: The ID of the user
             medicine_id: The ID of the medicine
             completed: Boolean indicating if medicine was taken
+            date: YYYY-MM-DD date of the dose, defaults to today
+            time: HH:MM time of the dose, defaults to now
         
         Returns:
-            bool: True if successfully updated, False otherwise
+            tuple: (medicine found, status recorded), or None if an error occurred.
+                   A found medicine whose status was not recorded had already
+                   been taken that day.
         """
         try:
-            db = get_db()
-            today = datetime.now().strftime('%Y-%m-%d')
-            current_time = datetime.now().strftime('%H:%M')
+            now = datetime.now()
+            today = now.strftime('%Y-%m-%d')
+            date = date or today
+            time = time or now.strftime('%H:%M')
             
-            # Prepare the history entry
-            history_entry = {
-                'date': today,
-                'time': current_time,
-                'completed': completed
-            }
+            # An event written for a missing medicine would stay pending
+            if not User.has_medicine(user_id, medicine_id):
+                return False, False
             
-            # Find the medicine in user's medicines array
-            user = db.users.find_one(
-                {
-                    '_id': ObjectId(user_id),
-                    'medicines._id': ObjectId(medicine_id)
-                }
-            )
+            # The history entry itself lives in the dose_events collection
+            if completed:
+                event_id = DoseEvent.mark_taken(user_id, medicine_id, date, time)
+                if event_id is None:
+                    return True, False
+            else:
+                event_id = DoseEvent.create(user_id, medicine_id, False, date, time)
             
-            if not user:
-                return False
+            def build_fields(version):
+                fields = {'version': version}
                 
-            # Check if there's an entry for today and update it, or add a new one
-            result = db.users.update_one(
-                {
-                    '_id': ObjectId(user_id),
-                    'medicines._id': ObjectId(medicine_id)
-                },
-                {
-                    '$push': {
-                        'medicines.$.history': history_entry
-                    },
-                    '$set': {
-                        'medicines.$.last_status': completed,
-                        'medicines.$.last_taken': datetime.now() if completed else None
-                    }
-                }
-            )
+                # Only today's doses change the quick-access status on the medicine
+                if date == today:
+                    fields['last_status'] = User._literal(completed)
+                    fields['last_taken'] = User._literal(now if completed else None)
+                
+                return User._update_medicines({medicine_id: fields})
+            
+            try:
+                version = User._versioned_update(
+                    user_id,
+                    build_fields,
+                    {'medicines._id': ObjectId(medicine_id)}
+                )
+            except Exception:
+                # A pending event would be synced forever and, once taken,
+                # block the day's real mark
+                DoseEvent.delete(event_id)
+                raise
+            
+            if version is None:
+                # The medicine was deleted meanwhile, drop the event recorded for it
+                DoseEvent.delete(event_id)
+                return False, False
             
-            return result.modified_count > 0
+            DoseEvent.set_version(event_id, version)
+            
+            return True, True
             
         except Exception as e:
             print(f"Error updating medicine status: {str(e)}")
-            return False
+            return None
+
+    @staticmethod
+    def record_doses(user_id, doses):
+        """
+        Record many dose statuses with one data_version bump
+        
+        Doses are {'medicine_id', 'completed', 'date', 'time'}. Events are
+        written with one bulk write, and every medicine with a recorded dose is
+        stamped with the same new version in one update.
+        
+        Returns:
+            list: 'recorded', 'already_taken' or 'not_found' for each dose, or
+                  None if the user does not exist
+        """
+        user = User.get_by_id(user_id, {'medicines._id': 1})
+        if user is None:
+            return None
+        
+        medicine_ids = {str(medicine['_id']) for medicine in user.get('medicines', [])}
+        known = [dose for dose in doses if dose['medicine_id'] in medicine_ids]
+        event_ids = iter(DoseEvent.record_many(user_id, known))
+        
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        statuses = []
+        recorded = []
+        fields_by_id = {}
+        
+        for dose in doses:
+            if dose['medicine_id'] not in medicine_ids:
+                statuses.append('not_found')
+                continue
+            
+            event_id = next(event_ids)
+            if event_id is None:
+                statuses.append('already_taken')
+                continue
+            
+            statuses.append('recorded')
+            recorded.append(event_id)
+            fields = fields_by_id.setdefault(dose['medicine_id'], {})
+            
+            # Only today's doses change the quick-access status, the last one wins
+            if dose['date'] == today:
+                fields['last_status'] = User._literal(dose['completed'])
+                fields['last_taken'] = User._literal(now if dose['completed'] else None)
+        
+        if recorded:
+            def build_fields(version):
+                return User._update_medicines({
+                    medicine_id: dict(fields, version=version)
+                    for medicine_id, fields in fields_by_id.items()
+                })
+            
+            try:
+                version = User._versioned_update(user_id, build_fields)
+            except Exception:
+                DoseEvent.delete_many(recorded)
+                raise
+            
+            if version is None:
+                # The user was deleted meanwhile, the events must not stay pending
+                DoseEvent.delete_many(recorded)
+                return None
+            
+            DoseEvent.set_versions(recorded, version)
+        
+        return statuses
 
 """
 Example Medicine Schema:
@@ -216,14 +627,17 @@ Example Medicine Schema:
     "notes": "Take with food",
     "created_at": datetime,
     "updated_at": datetime,
-    "history": [
-        {
-            "date": "2025-05-01",
-            "timestamp": datetime,
-            "completed": true
-        }
-    ],
+    # Dose history is stored in the dose_events collection (see dose_event.py).
+    # Older documents may still carry an embedded "history" array until
+    # migrate_dose_history.py has been run.
     "last_status": true,  # Quick access to last completion status
-    "last_taken": datetime  # Timestamp of last taken medicine
+    "last_taken": datetime,  # Timestamp of last taken medicine
+    "version": 12  # User data_version at which this medicine last changed
 }
+
+The user document itself also carries:
+    "data_version": 12,  # Incremented by every write
+    "field_versions": {"first_name": 3},  # data_version at which each profile field changed
+    "tombstones": [{"type": "medicine", "id": "...", "version": 11}]  # Recent deletions
+
 """
\ No newline at end of file
@@ -1,16 +1,10 @@
 from flask import Blueprint, request, jsonify
 from app.services.auth_service import AuthService
-from app.utils.token_utils import refresh_token_required
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from app.utils.token_utils import token_required, refresh_token_required
+from app.utils.rate_limit import limiter
 
 auth_bp = Blueprint('auth', __name__)
 
-limiter = Limiter(
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
-)
-
 @auth_bp.route('/register', methods=['POST'])
 @limiter.limit("20 per hour")
 def register():
@@ -66,6 +60,37 @@ def refresh(user_id):
     else:
         return jsonify({'message': result}), status_code
 
+@auth_bp.route('/logout', methods=['POST'])
+@token_required
+def logout(user_id):
+    """
+    Logout this session, revoking its access token and the refresh token in the body
+    """
+    
+    data = request.get_json(silent=True) or {}
+    access_token = request.headers['Authorization'].split(' ')[1]
+    
+    success, result, status_code = AuthService.logout(user_id, access_token, data.get('refresh_token'))
+    
+    if success:
+        return jsonify({'message': result}), status_code
+    else:
+        return jsonify({'message': result}), status_code
+
+@auth_bp.route('/logout-all', methods=['POST'])
+@token_required
+def logout_all(user_id):
+    """
+    Logout everywhere, revoking all tokens of the user
+    """
+    
+    success, result, status_code = AuthService.logout_all(user_id)
+    
+    if success:
+        return jsonify({'message': result}), status_code
+    else:
+        return jsonify({'message': result}), status_code
+
 @auth_bp.route('/check-auth', methods=['GET'])
 def check_auth():
     """
@@ -1,14 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 import os
 import re
+import threading
+from queue import Queue, Empty
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationBufferMemory
 from langchain.tools import Tool
 from langchain.agents import AgentType, initialize_agent
 from langchain.utilities import GoogleSearchAPIWrapper
+from langchain.callbacks.base import BaseCallbackHandler
 from app.utils.token_utils import token_required
+from app.utils.chat_memory import chat_memory, format_history
+from app.utils.response_cache import response_cache
+from app.config import Config
 from dotenv import load_dotenv
 
 # Set up API key (in a production app, this would be environment variables)
@@ -20,6 +25,11 @@ os.environ.setdefault("GOOGLE_CSE_ID", os.getenv("GOOGLE_CSE_ID"))   # For searc
 
 chat_bp = Blueprint('chat', __name__)
 
+SSE_MIMETYPE = 'text/event-stream'
+
+# Seconds between keep-alive comments while the agent is searching
+SSE_KEEPALIVE = 15
+
 # Simple medical term database (lightweight alternative to pretrained models)
 MEDICAL_TERMS = {
     "HTN": "Hypertension",
@@ -29,10 +39,61 @@ MEDICAL_TERMS = {
     "COPD": "Chronic Obstructive Pulmonary Disease"
 }
 
+class StreamingGemini(ChatGoogleGenerativeAI):
+    """
+    Gemini that uses the streaming API when an AnswerStreamHandler is attached
+
+    Without one every call uses the regular API as before. The handler only
+    receives on_llm_new_token callbacks from streaming calls.
+    """
+    
+    def _should_stream(self, *, async_api, run_manager=None, **kwargs):
+        if run_manager and any(isinstance(h, AnswerStreamHandler) for h in run_manager.handlers):
+            return True
+        return super()._should_stream(async_api=async_api, run_manager=run_manager, **kwargs)
+
+class AnswerStreamHandler(BaseCallbackHandler):
+    """
+    Collects the tokens of the answer to the user in a queue
+
+    The conversational agent also generates its reasoning and tool calls, its
+    answer is the part of an LLM call after the "AI:" prefix. With prefix None
+    every token belongs to the answer.
+    """
+    
+    def __init__(self, prefix=None):
+        self.prefix = f"{prefix}:" if prefix else None
+        self.queue = Queue()
+        self._text = ''
+        self._sent = None
+    
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._text = ''
+        self._sent = None if self.prefix else 0
+    
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.on_llm_start(serialized, [], **kwargs)
+    
+    def on_llm_new_token(self, token, **kwargs):
+        self._text += token
+        
+        if self._sent is None:
+            start = self._text.find(self.prefix)
+            if start < 0:
+                return
+            # Skip the prefix and the whitespace after it
+            self._sent = start + len(self.prefix)
+            while self._sent < len(self._text) and self._text[self._sent].isspace():
+                self._sent += 1
+        
+        if self._sent < len(self._text):
+            self.queue.put(self._text[self._sent:])
+            self._sent = len(self._text)
+
 # Initialize Gemini model through Langchain
 def init_gemini():
     try:
-        gemini = ChatGoogleGenerativeAI(
+        gemini = StreamingGemini(
             model="gemini-2.0-flash",
             temperature=0.2,
             convert_system_message_to_human=True,
@@ -87,6 +148,16 @@ def extract_medical_terms(text):
             
     return list(set(found_terms))
 
+# Normalize a prompt for the response cache, so that prompts differing only
+# in case, whitespace, punctuation or abbreviations share a response
+def normalize_prompt(text):
+    text = text.lower()
+    for term, expansion in MEDICAL_TERMS.items():
+        text = re.sub(r'\b' + re.escape(term.lower()) + r'\b', expansion.lower(), text)
+    
+    text = re.sub(r'[?!.,;:]+', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
 # Create citation extraction function
 def extract_citations(text):
     """Extract and format citations from search results"""
@@ -111,8 +182,8 @@ def create_medical_agent():
     if not gemini:
         return None
     
-    # Initialize memory
-    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    # No memory here, the agent is shared by all users and each request passes
+    # the chat_history of its user's session from chat_memory
     
     # Get search tool
     search_tool = init_search_tool()
@@ -125,7 +196,6 @@ def create_medical_agent():
                 tools,
                 gemini,
                 agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
-                memory=memory,
                 verbose=True
             )
             return agent
@@ -148,8 +218,7 @@ def create_medical_agent():
     
     chain = LLMChain(
         llm=gemini,
-        prompt=medical_prompt,
-        memory=memory
+        prompt=medical_prompt
     )
     
     return chain
@@ -157,22 +226,12 @@ def create_medical_agent():
 # Global agent instance
 medical_agent = create_medical_agent()
 
-@chat_bp.route('', methods=['POST'])
-@token_required
-def process_chat(user_id):
+def run_medical_agent(query, medical_terms, chat_history, callbacks=None):
     """
-    Process a medical chat prompt and return a response
+    Answer a query with the medical agent
+
+    Returns the raw response and whether it is a real answer
     """
-    data = request.get_json()
-    
-    # Validate the request data
-    if not data or 'prompt' not in data:
-        return jsonify({'response': 'Please provide a medical question to continue.'}), 400
-    
-    query = data['prompt']
-    medical_terms = extract_medical_terms(query)
-    
-    # Process with medical agent
     try:
         if medical_agent:
             if hasattr(medical_agent, 'run'):  # Agent interface
@@ -182,20 +241,24 @@ def process_chat(user_id):
                     terms_text = ", ".join(medical_terms)
                     enhanced_query = f"{query}\n\nDetected medical terms: {terms_text}"
                 
-                response = medical_agent.run(enhanced_query)
+                response = medical_agent.run(input=enhanced_query, chat_history=chat_history, callbacks=callbacks)
             else:  # Chain interface
-                response = medical_agent.run(question=query)
+                response = medical_agent.run(question=query, chat_history=chat_history, callbacks=callbacks)
+            return response, True
         else:
             # Direct model fallback
             gemini = init_gemini()
             if gemini:
-                response = gemini.predict(query)
-            else:
-                response = "I'm currently unable to process medical queries. Please try again later."
+                return gemini.predict(query), False
+            return "I'm currently unable to process medical queries. Please try again later.", False
     except Exception as e:
         print(f"Error processing query: {str(e)}")
-        response = "I understand you have a medical question. While I can't access my full capabilities right now, I recommend consulting healthcare resources for medical concerns."
-    
+        return "I understand you have a medical question. While I can't access my full capabilities right now, I recommend consulting healthcare resources for medical concerns.", False
+
+def clean_response(response):
+    """
+    Replace raw URLs with a list of sources and remove excessive disclaimers
+    """
     # Process response to include citations
     citations = extract_citations(response)
     if citations:
@@ -207,5 +270,112 @@ def process_chat(user_id):
     response = re.sub(r'(I am not a doctor|This is not medical advice|consult with a healthcare professional|cannot provide personalized medical diagnosis)', '', response)
     response = re.sub(r'\s+', ' ', response).strip()
     
+    return response
+
+def sse_event(name, data):
+    """
+    Format a server-sent event with JSON data
+    """
+    return f"event: {name}\ndata: {current_app.json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """
+    Stream server-sent events without buffering by proxies
+    """
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(events), mimetype=SSE_MIMETYPE, headers=headers)
+
+def stream_chat(user_id, query, medical_terms, chat_history, cache_prompt=None):
+    """
+    Answer a query as server-sent events
+
+    "token" events carry the answer as the model writes it. The final "done"
+    event carries the whole response with citations and cleanup applied, and
+    replaces the streamed text.
+    """
+    # The conversational agent prefixes its answer, a plain chain does not
+    handler = AnswerStreamHandler('AI' if hasattr(medical_agent, 'agent') else None)
+    result = {}
+    
+    def work():
+        try:
+            result['response'], result['answered'] = run_medical_agent(query, medical_terms, chat_history, [handler])
+        finally:
+            handler.queue.put(None)
+    
+    threading.Thread(target=work, daemon=True).start()
+    
+    def events():
+        while True:
+            try:
+                token = handler.queue.get(timeout=SSE_KEEPALIVE)
+            except Empty:
+                # Keeps proxies from closing the idle connection
+                yield ": keep-alive\n\n"
+                continue
+            
+            if token is None:
+                break
+            yield sse_event('token', {'token': token})
+        
+        response = clean_response(result['response'])
+        if result['answered']:
+            chat_memory.add_exchange(user_id, query, response)
+            if cache_prompt:
+                response_cache.set(cache_prompt, response)
+        
+        yield sse_event('done', {'response': response})
+    
+    return sse_response(events())
+
+@chat_bp.route('', methods=['POST'])
+@token_required
+def process_chat(user_id):
+    """
+    Process a medical chat prompt and return a response
+
+    Clients that accept text/event-stream get the response as it is written,
+    see stream_chat. Prompts that start a conversation are answered from the
+    response cache when the same question was asked before.
+    """
+    data = request.get_json()
+    
+    # Validate the request data
+    if not data or 'prompt' not in data:
+        return jsonify({'response': 'Please provide a medical question to continue.'}), 400
+    
+    query = data['prompt']
+    medical_terms = extract_medical_terms(query)
+    chat_history = format_history(chat_memory.history(user_id))
+    stream = request.accept_mimetypes.best_match(['application/json', SSE_MIMETYPE]) == SSE_MIMETYPE
+    
+    # Answers depend on the conversation, only first prompts are cached
+    cache_prompt = None
+    if Config.CHAT_CACHE_ENABLED:
+        if chat_history:
+            response_cache.bypass()
+        else:
+            cache_prompt = normalize_prompt(query)
+            cached = response_cache.get(cache_prompt)
+            
+            if cached is not None:
+                chat_memory.add_exchange(user_id, query, cached)
+                
+                if stream:
+                    return sse_response(iter([sse_event('done', {'response': cached})]))
+                return jsonify({'response': cached}), 200
+    
+    if stream:
+        return stream_chat(user_id, query, medical_terms, chat_history, cache_prompt)
+    
+    response, answered = run_medical_agent(query, medical_terms, chat_history)
+    response = clean_response(response)
+    
+    # Only real answers become part of the conversation and the cache
+    if answered:
+        chat_memory.add_exchange(user_id, query, response)
+        if cache_prompt:
+            response_cache.set(cache_prompt, response)
+    
     # Return in requested format
     return jsonify({'response': response}), 200
\ No newline at end of file
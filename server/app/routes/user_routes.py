@@ -1,12 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from app.services.user_service import UserService
 from app.utils.token_utils import token_required
+from app.utils.etag_utils import conditional_get
+from app.utils.request_schemas import DoseStatus, decode
 from datetime import datetime
 
 user_bp = Blueprint('user', __name__)
 
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
 @user_bp.route('/profile', methods=['GET'])
 @token_required
+@conditional_get
 def get_profile(user_id):
     """
     Get user profile information
@@ -47,8 +52,23 @@ def update_profile(user_id):
     else:
         return jsonify({'message': result}), status_code
 
+@user_bp.route('/dashboard', methods=['GET'])
+@token_required
+@conditional_get
+def get_dashboard(user_id):
+    """
+    Get today's medicines, progress, 7-day schedule and all medicines in one call
+    """
+    success, result, status_code = UserService.get_dashboard(user_id)
+    
+    if success:
+        return jsonify(result), status_code
+    else:
+        return jsonify({'message': result}), status_code
+
 @user_bp.route('/medicines', methods=['GET'])
 @token_required
+@conditional_get
 def get_medicines(user_id):
     """
     Get all medicines for a user
@@ -62,6 +82,7 @@ def get_medicines(user_id):
 
 @user_bp.route('/medicines/today', methods=['GET'])
 @token_required
+@conditional_get
 def get_today_medicines(user_id):
     """
     Get medicines scheduled for today
@@ -133,6 +154,10 @@ def update_medicine_status(user_id, medicine_id):
     if not data or 'completed' not in data:
         return jsonify({'message': 'Completed status is required'}), 400
     
+    data, error = decode(data, DoseStatus)
+    if error:
+        return jsonify({'message': error}), 400
+    
     success, result, status_code = UserService.update_medicine_status(user_id, medicine_id, data['completed'])
     
     if success:
@@ -142,6 +167,7 @@ def update_medicine_status(user_id, medicine_id):
 
 @user_bp.route('/medicines/schedule', methods=['GET'])
 @token_required
+@conditional_get
 def get_schedule(user_id):
     """
     Get medicine schedule for calendar view
@@ -150,6 +176,16 @@ def get_schedule(user_id):
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
+    # Stream one JSON document per day when the client asks for NDJSON
+    if request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        success, result, status_code = UserService.stream_medicine_schedule(user_id, start_date, end_date)
+        
+        if not success:
+            return jsonify({'message': result}), status_code
+        
+        lines = (current_app.json.dumps(day) + '\n' for day in result)
+        return Response(stream_with_context(lines), status=status_code, mimetype=NDJSON_MIMETYPE)
+    
     success, result, status_code = UserService.get_medicine_schedule(user_id, start_date, end_date)
     
     if success:
@@ -157,14 +193,71 @@ def get_schedule(user_id):
     else:
         return jsonify({'message': result}), status_code
 
+@user_bp.route('/medicines/adherence', methods=['GET'])
+@token_required
+@conditional_get
+def get_adherence(user_id):
+    """
+    Get medicine adherence per month, quarter or year
+    """
+    # Optional query parameters for date range and grouping
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    period = request.args.get('period', 'month')
+    
+    success, result, status_code = UserService.get_adherence(user_id, start_date, end_date, period)
+    
+    if success:
+        return jsonify(result), status_code
+    else:
+        return jsonify({'message': result}), status_code
+
 @user_bp.route('/medicines/progress', methods=['GET'])
 @token_required
+@conditional_get
 def get_today_progress(user_id):
     """
     Get today's medicine completion progress
     """
     success, result, status_code = UserService.get_today_progress(user_id)
     
+    if success:
+        return jsonify(result), status_code
+    else:
+        return jsonify({'message': result}), status_code
+
+@user_bp.route('/sync', methods=['GET'])
+@token_required
+def get_changes(user_id):
+    """
+    Get the changes after a data version for offline-first clients
+    """
+    # Clients without local data start from version 0
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'message': 'since must be an integer'}), 400
+    
+    success, result, status_code = UserService.get_changes(user_id, since)
+    
+    if success:
+        return jsonify(result), status_code
+    else:
+        return jsonify({'message': result}), status_code
+
+@user_bp.route('/sync/doses', methods=['POST'])
+@token_required
+def upload_doses(user_id):
+    """
+    Upload dose statuses recorded while offline
+    """
+    data = request.get_json()
+    
+    if not data or 'doses' not in data:
+        return jsonify({'message': 'Doses are required'}), 400
+    
+    success, result, status_code = UserService.upload_doses(user_id, data['doses'])
+    
     if success:
         return jsonify(result), status_code
     else:
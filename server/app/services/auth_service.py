@@ -1,7 +1,11 @@
 from app.models.user import User
-from app.utils.password_utils import hash_password, check_password, validate_password
-from app.utils.token_utils import generate_token
-from email_validator import validate_email, EmailNotValidError
+from app.utils.password_utils import hash_password, check_password, needs_rehash, validate_password
+from app.utils.bcrypt_pool import BcryptPoolBusy
+from app.utils.token_utils import generate_token, decode_token
+from app.utils.revocation import revocations
+from app.utils.email_utils import normalize_email
+from email_validator import EmailNotValidError
+from pymongo.errors import DuplicateKeyError
 
 class AuthService:
     """
@@ -20,24 +24,30 @@ class AuthService:
                 return False, f"Missing required field: {field}", 400
         
         try:
-            valid_email = validate_email(user_data['email'])
-            user_data['email'] = valid_email.email  
+            user_data['email'] = normalize_email(user_data['email'])
         except EmailNotValidError as e:
             return False, str(e), 400
         
-        if User.get_by_email(user_data['email']):
-            return False, "Email already registered", 409
-    
-        if User.get_by_username(user_data['username']):
-            return False, "Username already taken", 409
-        
         is_valid, password_message = validate_password(user_data['password'])
         if not is_valid:
             return False, password_message, 400
         
-        user_data['password'] = hash_password(user_data['password'])
+        try:
+            user_data['password'] = hash_password(user_data['password'])
+        except BcryptPoolBusy:
+            return False, "Server is busy, please try again", 503
         
-        user_id = User.create(user_data)
+        # The unique indexes on email and username reject duplicates in the same
+        # round trip as the insert, without a race between check and insert
+        try:
+            user_id = User.create(user_data)
+        except DuplicateKeyError as e:
+            field = User.duplicate_key_field(e)
+            if field == 'email':
+                return False, "Email already registered", 409
+            if field == 'username':
+                return False, "Username already taken", 409
+            return False, "Email or username already registered", 409
         
         return True, user_id, 201
     
@@ -50,12 +60,23 @@ class AuthService:
         if 'email' not in login_data or 'password' not in login_data:
             return False, "Email and password are required", 400
         
-        user = User.get_by_email(login_data['email'])
+        user = User.get_by_email(login_data['email'], User.LOGIN_PROJECTION)
         if not user:
             return False, "Invalid email or password", 401
         
-        if not check_password(login_data['password'], user['password']):
-            return False, "Invalid email or password", 401
+        try:
+            if not check_password(login_data['password'], user['password']):
+                return False, "Invalid email or password", 401
+        except BcryptPoolBusy:
+            return False, "Server is busy, please try again", 503
+        
+        # Move the hash to the configured cost while the password is known
+        if needs_rehash(user['password']):
+            try:
+                User.update_password(user['_id'], hash_password(login_data['password']), user['password'])
+            except BcryptPoolBusy:
+                # Retried on the next login
+                pass
     
         access_token = generate_token(user['_id'], 'access')
         refresh_token = generate_token(user['_id'], 'refresh')
@@ -79,7 +100,7 @@ class AuthService:
         """
         Generate new access and refresh tokens
         """
-        user = User.get_by_id(user_id)
+        user = User.get_by_id(user_id, {'_id': 1})
         if not user:
             return False, "User not found", 404
         
@@ -91,4 +112,29 @@ class AuthService:
             'refresh_token': refresh_token
         }
         
-        return True, response_data, 200
\ No newline at end of file
+        return True, response_data, 200
+    
+    @staticmethod
+    def logout(user_id, access_token, refresh_token=None):
+        """
+        Revoke the access token of this session and its refresh token if given
+        """
+        for token in (access_token, refresh_token):
+            if not token:
+                continue
+            
+            # Tokens of other users or already invalid ones are ignored
+            payload = decode_token(token)
+            if payload and payload.get('user_id') == user_id:
+                revocations.revoke_token(payload)
+        
+        return True, "Logged out successfully", 200
+    
+    @staticmethod
+    def logout_all(user_id):
+        """
+        Revoke every access and refresh token of a user, on all devices
+        """
+        revocations.revoke_user(user_id)
+        
+        return True, "Logged out of all devices", 200
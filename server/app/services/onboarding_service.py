@@ -10,7 +10,7 @@ class OnboardingService:
         """
         Get the current onboarding status for a user
         """
-        user = User.get_by_id(user_id)
+        user = User.get_by_id(user_id, {'onboarding_complete': 1, 'onboarding_step': 1})
         if not user:
             return False, "User not found", 404
         
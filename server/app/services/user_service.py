@@ -3,30 +3,48 @@ from bson.objectid import ObjectId
 from datetime import datetime, timedelta
 import pytz
 from app.models.user import User  # Add missing User model import
+from app.models.dose_event import DoseEvent
+from app.utils.recurrence import cache_recurrence
+from app.utils.medicine import Medicine
+from app.utils.completion_index import CompletionIndex
+from app.utils.schedule_matrix import ScheduleMatrix, PERIODS
+from app.utils.cache import get_cache
+from app.utils.etag_utils import request_data_version
+from app.utils.response_schemas import PROFILE, MEDICINE, DOSE_EVENT
+from app.utils.request_schemas import NewMedicine, MedicineUpdate, Dose, SERVER_FIELDS, decode, recurrence_error
 
 class UserService:
     """
     Service for user-related operations
     """
     
+    # Number of days of dose history returned alongside the medicine list
+    HISTORY_WINDOW_DAYS = 30
+    
+    # Default number of days covered by the adherence report
+    ADHERENCE_WINDOW_DAYS = 365
+    
+    # Number of days computed at once when streaming a schedule
+    STREAM_CHUNK_DAYS = 31
+    
+    # Maximum number of queued doses accepted by a single sync upload
+    MAX_UPLOAD_DOSES = 500
+    
     @staticmethod
     def get_user_profile(user_id):
         """
         Get user profile information
         Returns (success, data, status_code)
         """
-        db = get_db()
-        
-        user = db.users.find_one({'_id': ObjectId(user_id)})
-        
-        if not user:
-            return False, "User not found", 404
-        
-        # Remove sensitive data
-        user.pop('password', None)
-        user['_id'] = str(user['_id'])
+        def compute():
+            user = User.get_profile(user_id)
+            
+            if not user:
+                return False, "User not found", 404
+            
+            return True, PROFILE.dump(user), 200
         
-        return True, user, 200
+        return UserService._cached(user_id, 'profile', (), compute)
     
     @staticmethod
     def update_user_profile(user_id, profile_data):
@@ -34,46 +52,40 @@ class UserService:
         Update user profile information
         Returns (success, data, status_code)
         """
-        db = get_db()
+        # Ensure password, _id, medicines and sync bookkeeping are not updated
+        # through this method
+        for field in User.INTERNAL_FIELDS:
+            profile_data.pop(field, None)
         
-        # Ensure password is not updated through this method
-        if 'password' in profile_data:
-            profile_data.pop('password')
+        # Dotted keys and operators would write into other fields, such as
+        # every medicine's name with "medicines.name"
+        invalid_fields = User.invalid_fields(profile_data)
+        if invalid_fields:
+            return False, f"Invalid profile field: {invalid_fields[0]}", 400
         
-        # Remove _id field if present to prevent the immutability error
-        if '_id' in profile_data:
-            profile_data.pop('_id')
+        db = get_db()
         
         # Ensure email and username cannot be changed if they already exist
         if 'email' in profile_data or 'username' in profile_data:
-            existing_user = db.users.find_one({'_id': ObjectId(user_id)})
+            existing_user = User.get_by_id(user_id, {'email': 1, 'username': 1})
             if not existing_user:
                 return False, "User not found", 404
                 
             if 'email' in profile_data and profile_data['email'] != existing_user.get('email'):
                 # Check if email already exists
-                if db.users.find_one({'email': profile_data['email'], '_id': {'$ne': ObjectId(user_id)}}):
+                if db.users.find_one({'email': profile_data['email'], '_id': {'$ne': ObjectId(user_id)}}, {'_id': 1}):
                     return False, "Email already in use", 400
             
             if 'username' in profile_data and profile_data['username'] != existing_user.get('username'):
                 # Check if username already exists
-                if db.users.find_one({'username': profile_data['username'], '_id': {'$ne': ObjectId(user_id)}}):
+                if db.users.find_one({'username': profile_data['username'], '_id': {'$ne': ObjectId(user_id)}}, {'_id': 1}):
                     return False, "Username already in use", 400
         
         # Update user profile
-        result = db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$set': profile_data}
-        )
-        
-        if result.modified_count == 0:
+        if not User.update_profile(user_id, profile_data):
             return False, "No changes made to profile", 304
         
-        updated_user = db.users.find_one({'_id': ObjectId(user_id)})
-        updated_user.pop('password', None)
-        updated_user['_id'] = str(updated_user['_id'])
-        
-        return True, updated_user, 200
+        return True, PROFILE.dump(User.get_profile(user_id)), 200
     
     @staticmethod
     def get_user_medicines(user_id):
@@ -81,21 +93,25 @@ class UserService:
         Get all medicines for a user
         Returns (success, data, status_code)
         """
-        db = get_db()
-        
-        user = db.users.find_one({'_id': ObjectId(user_id)})
-        
-        if not user:
-            return False, "User not found", 404
-        
-        medicines = user.get('medicines', [])
+        today = datetime.now()
+        start_date = (today - timedelta(days=UserService.HISTORY_WINDOW_DAYS - 1)).strftime('%Y-%m-%d')
+        end_date = today.strftime('%Y-%m-%d')
         
-        # Convert ObjectId to string
-        for medicine in medicines:
-            if '_id' in medicine:
-                medicine['_id'] = str(medicine['_id'])
+        def compute():
+            medicines = User.get_medicines(user_id, start_date, end_date)
+            
+            if medicines is None:
+                return False, "User not found", 404
+            
+            medicines = Medicine.from_documents(medicines)
+            
+            # Attach recent dose history from the dose_events collection
+            history = DoseEvent.get_history(user_id, start_date, end_date)
+            
+            return True, {'medicines': UserService._dump_medicines(medicines, history, start_date, end_date)}, 200
         
-        return True, {'medicines': medicines}, 200
+        # The history window moves with the date, so it is part of the key
+        return UserService._cached(user_id, 'medicines', (start_date, end_date), compute)
     
     @staticmethod
     def get_today_medicines(user_id):
@@ -103,30 +119,24 @@ class UserService:
         Get medicines scheduled for today
         Returns (success, data, status_code)
         """
-        db = get_db()
-        
-        user = db.users.find_one({'_id': ObjectId(user_id)})
-        
-        if not user:
-            return False, "User not found", 404
-        
-        medicines = user.get('medicines', [])
         today = datetime.now().strftime('%Y-%m-%d')
-        today_medicines = []
         
-        for medicine in medicines:
-            # Check if medicine should be taken today based on schedule
-            if UserService._is_scheduled_today(medicine):
-                # Add to today's list
-                medicine_copy = medicine.copy()
-                if '_id' in medicine_copy:
-                    medicine_copy['_id'] = str(medicine_copy['_id'])
-                today_medicines.append(medicine_copy)
-        
-        # Sort by time
-        today_medicines.sort(key=lambda x: x.get('time', '00:00'))
+        def compute():
+            medicines = User.get_medicines(user_id, today, today)
+            
+            if medicines is None:
+                return False, "User not found", 404
+            
+            medicines = Medicine.from_documents(medicines)
+            
+            history = DoseEvent.get_history(user_id, today, today)
+            today_medicines = UserService._dump_medicines(
+                UserService._build_today_medicines(medicines), history, today, today
+            )
+            
+            return True, {'medicines': today_medicines}, 200
         
-        return True, {'medicines': today_medicines}, 200
+        return UserService._cached(user_id, 'today_medicines', (today, today), compute)
     
     @staticmethod
     def add_medicine(user_id, medicine_data):
@@ -134,37 +144,21 @@ class UserService:
         Add a new medicine to user's schedule
         Returns (success, data, status_code)
         """
-        db = get_db()
-        
-        # Validate required fields
-        required_fields = ['name', 'dosage', 'time', 'frequency']
-        for field in required_fields:
-            if field not in medicine_data:
-                return False, f"Missing required field: {field}", 400
+        # Dose history is recorded in the dose_events collection
+        medicine_data.pop('history', None)
         
-        # Generate a new ObjectId for the medicine
-        medicine_data['_id'] = ObjectId()
+        # Validate and normalize, unknown fields are rejected
+        medicine_data, error = decode(medicine_data, NewMedicine)
+        if error:
+            return False, error, 400
         
-        # Set default values
-        medicine_data['created_at'] = datetime.now()
-        medicine_data['updated_at'] = datetime.now()
+        # Update user document, the model sets the ID, timestamps and version
+        success, _ = User.add_medicine(user_id, medicine_data)
         
-        # Add dosage history array
-        medicine_data['history'] = []
-        
-        # Update user document
-        result = db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$push': {'medicines': medicine_data}}
-        )
-        
-        if result.modified_count == 0:
+        if not success:
             return False, "Failed to add medicine", 500
         
-        # Convert ObjectId to string for response
-        medicine_data['_id'] = str(medicine_data['_id'])
-        
-        return True, medicine_data, 201
+        return True, MEDICINE.dump(medicine_data), 201
     
     @staticmethod
     def update_medicine(user_id, medicine_id, medicine_data):
@@ -172,53 +166,41 @@ class UserService:
         Update an existing medicine
         Returns (success, data, status_code)
         """
-        db = get_db()
-        
         # Remove fields that should not be updated directly
-        if 'created_at' in medicine_data:
-            medicine_data.pop('created_at')
-        if 'history' in medicine_data:
-            medicine_data.pop('history')
-        
-        # Set updated timestamp
-        medicine_data['updated_at'] = datetime.now()
-        
-        # Create update object for each field in medicine_data
-        update_dict = {}
-        for key, value in medicine_data.items():
-            update_dict[f'medicines.$.{key}'] = value
-        
-        # Update medicine
-        result = db.users.update_one(
-            {
-                '_id': ObjectId(user_id),
-                'medicines._id': ObjectId(medicine_id)
-            },
-            {'$set': update_dict}
-        )
+        for field in SERVER_FIELDS:
+            medicine_data.pop(field, None)
         
-        if result.matched_count == 0:
-            return False, "Medicine not found", 404
+        # Validate and normalize, unknown fields are rejected
+        medicine_data, error = decode(medicine_data, MedicineUpdate)
+        if error:
+            return False, error, 400
+        
+        if not medicine_data:
+            return False, "No fields to update", 400
+        
+        # A new frequency may use the days or dates the medicine already has
+        if 'frequency' in medicine_data:
+            stored_medicine = User.get_medicine(user_id, medicine_id)
+            if not stored_medicine:
+                return False, "Medicine not found", 404
+            
+            error = recurrence_error(dict(stored_medicine, **medicine_data))
+            if error:
+                return False, error, 400
         
-        if result.modified_count == 0:
-            return False, "No changes made to medicine", 304
+        # Update medicine, the model sets the updated timestamp and version
+        if not User.update_medicine(user_id, medicine_id, medicine_data):
+            return False, "Medicine not found", 404
         
         # Get updated medicine
-        user = db.users.find_one(
-            {
-                '_id': ObjectId(user_id),
-                'medicines._id': ObjectId(medicine_id)
-            },
-            {'medicines.$': 1}
-        )
+        updated_medicine = User.get_medicine(user_id, medicine_id)
         
-        if not user or 'medicines' not in user or len(user['medicines']) == 0:
+        if not updated_medicine:
             return False, "Failed to retrieve updated medicine", 500
         
-        updated_medicine = user['medicines'][0]
-        updated_medicine['_id'] = str(updated_medicine['_id'])
+        cache_recurrence(updated_medicine)
         
-        return True, updated_medicine, 200
+        return True, MEDICINE.dump(updated_medicine), 200
     
     @staticmethod
     def delete_medicine(user_id, medicine_id):
@@ -226,18 +208,10 @@ class UserService:
         Delete a medicine from user's schedule
         Returns (success, data, status_code)
         """
-        db = get_db()
-        
-        # Delete medicine
-        result = db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$pull': {'medicines': {'_id': ObjectId(medicine_id)}}}
-        )
-        
-        if result.matched_count == 0:
-            return False, "User not found", 404
-        
-        if result.modified_count == 0:
+        # Delete medicine, also removes its dose events and leaves a tombstone
+        if not User.delete_medicine(user_id, medicine_id):
+            if User.get_data_version(user_id) is None:
+                return False, "User not found", 404
             return False, "Medicine not found", 404
         
         return True, {"message": "Medicine deleted successfully"}, 200
@@ -249,56 +223,193 @@ class UserService:
         Returns (success, data, status_code)
         """
         try:
-            db = get_db()
-            
-            # First check if the medicine exists
-            user = db.users.find_one(
-                {
-                    '_id': ObjectId(user_id),
-                    'medicines._id': ObjectId(medicine_id)
-                },
-                {'medicines.$': 1}
-            )
+            # The model refuses a second "taken" for the same day at the database level
+            result = User.update_medicine_status(user_id, medicine_id, completed)
             
-            if not user or 'medicines' not in user or len(user['medicines']) == 0:
-                return False, "Medicine not found", 404
+            if result is None:
+                return False, "Failed to update medicine status", 500
             
-            medicine = user['medicines'][0]
-            today = datetime.now().strftime('%Y-%m-%d')
+            found, recorded = result
             
-            # Check if medicine is already marked as taken today and we're trying to mark it again
-            if completed:
-                for entry in medicine.get('history', []):
-                    if entry.get('date') == today and entry.get('completed', False):
-                        # Already marked as taken, return success instead of error
-                        return True, {"message": "Medicine already marked as taken today"}, 200
+            if not found:
+                return False, "Medicine not found", 404
             
-            # Call the model to update the status
-            success = User.update_medicine_status(user_id, medicine_id, completed)
-            
-            if not success:
-                return False, "Failed to update medicine status", 500
+            if not recorded:
+                # Already marked as taken, return success instead of error
+                return True, {"message": "Medicine already marked as taken today"}, 200
             
             return True, {"message": "Medicine status updated successfully"}, 200
         except Exception as e:
             print(f"Exception in update_medicine_status: {str(e)}")
             return False, f"An error occurred: {str(e)}", 500
     
+    @staticmethod
+    def get_changes(user_id, since=0):
+        """
+        Get everything that changed after a data version, for offline clients
+        
+        since=0, or a version older than the oldest remembered deletion,
+        returns a full snapshot with 'full' set, which replaces the client's copy.
+        Returns (success, data, status_code)
+        """
+        user = User.get_sync_state(user_id)
+        
+        if not user:
+            return False, "User not found", 404
+        
+        version = user.get('data_version', 0)
+        tombstones = user.get('tombstones', [])
+        
+        if since > version:
+            return False, "since is newer than the current data version", 400
+        
+        # Deletions older than the kept tombstones are forgotten, so the client
+        # has to start over to drop them
+        full = since <= 0 or (
+            len(tombstones) >= User.TOMBSTONE_LIMIT and since < tombstones[0]['version']
+        )
+        
+        field_versions = user.get('field_versions', {})
+        profile = {}
+        for field, value in user.items():
+            if field in User.INTERNAL_FIELDS:
+                continue
+            if full or field_versions.get(field, 0) > since:
+                profile[field] = value
+        
+        medicines = [
+            MEDICINE.dump(medicine) for medicine in user.get('medicines', [])
+            if full or medicine.get('version', 0) > since
+        ]
+        
+        if full:
+            # A snapshot only carries the recent dose history
+            deleted_medicines = []
+            start_date = (datetime.now() - timedelta(days=UserService.HISTORY_WINDOW_DAYS)).strftime('%Y-%m-%d')
+            dose_events = DoseEvent.find_changed(user_id, 0, start_date)
+        else:
+            deleted_medicines = [
+                tombstone['id'] for tombstone in tombstones
+                if tombstone['type'] == 'medicine' and tombstone['version'] > since
+            ]
+            dose_events = DoseEvent.find_changed(user_id, since)
+        
+        result = {
+            'version': version,
+            'full': full,
+            'profile': profile,
+            'medicines': medicines,
+            'deleted_medicines': deleted_medicines,
+            'dose_events': DOSE_EVENT.dump_many(dose_events)
+        }
+        
+        return True, result, 200
+    
+    @staticmethod
+    def upload_doses(user_id, doses):
+        """
+        Record dose statuses queued by a client while it was offline
+        
+        Every item is {'medicine_id', 'completed', 'date', 'time'} and gets a
+        status of recorded, already_taken, not_found or invalid, in order.
+        Returns (success, data, status_code)
+        """
+        if not isinstance(doses, list):
+            return False, "doses must be a list", 400
+        
+        if len(doses) > UserService.MAX_UPLOAD_DOSES:
+            return False, f"At most {UserService.MAX_UPLOAD_DOSES} doses can be uploaded at once", 400
+        
+        today = datetime.now().strftime('%Y-%m-%d')
+        results = []
+        valid = []
+        
+        for dose in doses:
+            dose, error = decode(dose, Dose)
+            if not error and dose['date'] > today:
+                error = "date must not be in the future"
+            
+            if error:
+                results.append({'status': 'invalid', 'message': error})
+            else:
+                results.append(None)
+                valid.append(dose)
+        
+        # All valid doses are written together, with a single version bump
+        try:
+            statuses = iter(User.record_doses(user_id, valid) or [])
+        except Exception as e:
+            print(f"Exception in upload_doses: {str(e)}")
+            return False, "Failed to update medicine status", 500
+        
+        results = [result or {'status': next(statuses, 'not_found')} for result in results]
+        
+        return True, {'version': User.get_data_version(user_id), 'results': results}, 200
+    
     @staticmethod
     def get_medicine_schedule(user_id, start_date=None, end_date=None):
         """
         Get medicine schedule for calendar view
         Returns (success, data, status_code)
         """
-        db = get_db()
+        start_date, end_date = UserService._resolve_schedule_range(start_date, end_date)
         
-        user = db.users.find_one({'_id': ObjectId(user_id)})
+        def compute():
+            medicines = User.get_medicines(user_id, start_date, end_date)
+            
+            if medicines is None:
+                return False, "User not found", 404
+            
+            medicines = Medicine.from_documents(medicines)
+            
+            completion_index = CompletionIndex.build(user_id, medicines, start_date, end_date)
+            schedule = UserService._generate_schedule(medicines, start_date, end_date, completion_index)
+            
+            return True, {'schedule': schedule, 'start_date': start_date, 'end_date': end_date}, 200
         
-        if not user:
+        # "completed" on past days does not depend on today, so the range is the key
+        return UserService._cached(user_id, 'schedule', (start_date, end_date), compute)
+    
+    @staticmethod
+    def stream_medicine_schedule(user_id, start_date=None, end_date=None):
+        """
+        Get medicine schedule for calendar view as a generator of days
+        
+        Days are computed STREAM_CHUNK_DAYS at a time, so the first day is ready
+        as soon as its chunk is, however large the range is.
+        Returns (success, generator of {'date', 'medicines'} or message, status_code)
+        """
+        start_date, end_date = UserService._resolve_schedule_range(start_date, end_date)
+        
+        medicines = User.get_medicines(user_id, start_date, end_date)
+        
+        if medicines is None:
             return False, "User not found", 404
         
-        medicines = user.get('medicines', [])
+        medicines = Medicine.from_documents(medicines)
         
+        def generate():
+            chunk_start = datetime.strptime(start_date, '%Y-%m-%d')
+            end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
+            
+            while chunk_start <= end_datetime:
+                chunk_end = min(chunk_start + timedelta(days=UserService.STREAM_CHUNK_DAYS - 1), end_datetime)
+                chunk_start_str = chunk_start.strftime('%Y-%m-%d')
+                chunk_end_str = chunk_end.strftime('%Y-%m-%d')
+                
+                completion_index = CompletionIndex.build(user_id, medicines, chunk_start_str, chunk_end_str)
+                matrix = ScheduleMatrix(medicines, chunk_start_str, chunk_end_str, completion_index)
+                
+                for date_str, day_medicines in matrix.iter_days():
+                    yield {'date': date_str, 'medicines': day_medicines}
+                
+                chunk_start = chunk_end + timedelta(days=1)
+        
+        return True, generate(), 200
+    
+    @staticmethod
+    def _resolve_schedule_range(start_date, end_date):
+        """Helper method to apply the default schedule range (7 days from today)"""
         # Always start from today if no start date provided
         today = datetime.now()
         if not start_date:
@@ -310,154 +421,226 @@ class UserService:
             end_datetime = start_datetime + timedelta(days=6)  # 7-day view
             end_date = end_datetime.strftime('%Y-%m-%d')
         
-        schedule = UserService._generate_schedule(medicines, start_date, end_date)
-        
-        return True, {'schedule': schedule, 'start_date': start_date, 'end_date': end_date}, 200
+        return start_date, end_date
     
     @staticmethod
-    def get_today_progress(user_id):
+    def get_adherence(user_id, start_date=None, end_date=None, period='month'):
         """
-        Get today's medicine completion progress
+        Get scheduled/taken counts and adherence per month, quarter or year
         Returns (success, data, status_code)
         """
-        db = get_db()
+        if period not in PERIODS:
+            return False, f"Period must be one of: {', '.join(PERIODS)}", 400
         
-        user = db.users.find_one({'_id': ObjectId(user_id)})
+        # Default to the last 12 months up to today
+        today = datetime.now()
+        if not end_date:
+            end_date = today.strftime('%Y-%m-%d')
         
-        if not user:
-            return False, "User not found", 404
+        try:
+            end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
+            if not start_date:
+                start_date = (end_datetime - timedelta(days=UserService.ADHERENCE_WINDOW_DAYS - 1)).strftime('%Y-%m-%d')
+            start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
+        except ValueError:
+            return False, "Dates must be in YYYY-MM-DD format", 400
         
-        medicines = user.get('medicines', [])
-        today = datetime.now().strftime('%Y-%m-%d')
+        if start_datetime > end_datetime:
+            return False, "start_date must not be after end_date", 400
         
-        today_medicines = []
-        completed_count = 0
+        medicines = User.get_medicines(user_id, start_date, end_date)
         
-        for medicine in medicines:
-            if UserService._is_scheduled_today(medicine):
-                today_medicines.append(medicine)
-                
-                # Check if medicine was taken today
-                if UserService._is_completed_today(medicine):
-                    completed_count += 1
+        if medicines is None:
+            return False, "User not found", 404
         
-        total_count = len(today_medicines)
-        progress = 0 if total_count == 0 else (completed_count / total_count) * 100
+        medicines = Medicine.from_documents(medicines)
+        
+        completion_index = CompletionIndex.build(user_id, medicines, start_date, end_date)
+        matrix = ScheduleMatrix(medicines, start_date, end_date, completion_index)
         
         result = {
-            'total': total_count,
-            'completed': completed_count,
-            'pending': total_count - completed_count,
-            'progress': progress
+            'period': period,
+            'start_date': start_date,
+            'end_date': end_date,
+            'periods': matrix.adherence(period, today.date())
         }
         
         return True, result, 200
     
     @staticmethod
-    def _is_scheduled_today(medicine):
-        """Helper method to determine if medicine is scheduled for today"""
+    def get_today_progress(user_id):
+        """
+        Get today's medicine completion progress
+        Returns (success, data, status_code)
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        
+        def compute():
+            medicines = User.get_medicines(user_id, today, today)
+            
+            if medicines is None:
+                return False, "User not found", 404
+            
+            medicines = Medicine.from_documents(medicines)
+            
+            completion_index = CompletionIndex.build(user_id, medicines, today, today)
+            result = UserService._build_progress(medicines, completion_index)
+            
+            return True, result, 200
+        
+        return UserService._cached(user_id, 'today_progress', (today, today), compute)
+    
+    @staticmethod
+    def get_dashboard(user_id):
+        """
+        Get everything the Home screen shows in one call: today's medicines,
+        today's progress, the 7-day schedule and all medicines with recent history
+        Returns (success, data, status_code)
+        """
         today = datetime.now()
         today_str = today.strftime('%Y-%m-%d')
+        history_start = (today - timedelta(days=UserService.HISTORY_WINDOW_DAYS - 1)).strftime('%Y-%m-%d')
+        start_date, end_date = UserService._resolve_schedule_range(None, None)
+        
+        def compute():
+            # One projected read of the medicines and one read of the dose events,
+            # covering both the history window and the upcoming schedule
+            medicines = User.get_medicines(user_id, history_start, end_date)
+            
+            if medicines is None:
+                return False, "User not found", 404
+            
+            medicines = Medicine.from_documents(medicines)
+            
+            events = list(DoseEvent.find_in_range(user_id, history_start, end_date))
+            history = DoseEvent.group_by_medicine(events)
+            completion_index = CompletionIndex.from_events(events, medicines, history_start, end_date)
+            
+            today_medicines = UserService._dump_medicines(
+                UserService._build_today_medicines(medicines), history, today_str, today_str
+            )
+            
+            progress = UserService._build_progress(medicines, completion_index)
+            schedule = UserService._generate_schedule(medicines, start_date, end_date, completion_index)
+            
+            all_medicines = UserService._dump_medicines(medicines, history, history_start, today_str)
+            
+            result = {
+                'today_medicines': today_medicines,
+                'progress': progress,
+                'schedule': schedule,
+                'start_date': start_date,
+                'end_date': end_date,
+                'medicines': all_medicines
+            }
+            
+            return True, result, 200
+        
+        return UserService._cached(user_id, 'dashboard', (history_start, end_date), compute)
+    
+    @staticmethod
+    def _cached(user_id, view, date_range, compute):
+        """
+        Return a computed view from the result cache, computing and storing it
+        on a miss. compute() returns (success, data, status_code) and only
+        successful results are cached.
+        """
+        # GET routes have read it already for their ETag
+        data_version = request_data_version(user_id)
         
-        # Check frequency type
-        frequency = medicine.get('frequency', 'daily')
+        # Let compute produce the error for unknown users
+        if data_version is None:
+            return compute()
         
-        if frequency == 'daily':
-            return True
+        # Both versions are read before computing, so a write racing with this
+        # request can only leave an entry under a version that is already gone.
+        # data_version also catches writes made outside this host's cache.
+        cache = get_cache()
+        version = cache.version(user_id)
+        key = ':'.join((view,) + date_range + (str(data_version),))
         
-        elif frequency == 'weekly':
-            days = medicine.get('days', [])
-            return today.strftime('%A').lower() in [day.lower() for day in days]
+        data = cache.get(user_id, key, version)
+        if data is not None:
+            return True, data, 200
         
-        elif frequency == 'monthly':
-            days_of_month = medicine.get('days_of_month', [])
-            return today.day in days_of_month
+        success, data, status_code = compute()
         
-        elif frequency == 'specific_dates':
-            dates = medicine.get('dates', [])
-            return today_str in dates
+        if success:
+            cache.set(user_id, key, data, version)
         
-        return False
+        return success, data, status_code
     
     @staticmethod
-    def _is_completed_today(medicine):
-        """Helper method to check if medicine was taken today"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        history = medicine.get('history', [])
-        for entry in history:
-            if entry.get('date') == today and entry.get('completed', False):
-                return True
-        
-        return False
+    def _is_scheduled_today(medicine, today):
+        """Helper method to determine if a Medicine is scheduled on today's date"""
+        return medicine.recurrence.occurs_on(today)
     
     @staticmethod
-    def _generate_schedule(medicines, start_date, end_date):
-        """Helper method to generate schedule for date range"""
-        start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
-        end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
-        
-        # Create empty schedule
-        schedule = {}
-        
-        # For each day in the range
-        current_date = start_datetime
-        while current_date <= end_datetime:
-            date_str = current_date.strftime('%Y-%m-%d')
-            schedule[date_str] = []
-            
-            # For each medicine
-            for medicine in medicines:
-                # Check if medicine is scheduled for this date
-                if UserService._is_scheduled_for_date(medicine, current_date):
-                    medicine_copy = {
-                        'id': str(medicine['_id']),
-                        'name': medicine['name'],
-                        'dosage': medicine['dosage'],
-                        'time': medicine['time']
-                    }
-                    
-                    # Check if it was completed on this date
-                    medicine_copy['completed'] = UserService._is_completed_on_date(medicine, date_str)
-                    
-                    schedule[date_str].append(medicine_copy)
-            
-            # Sort by time
-            schedule[date_str].sort(key=lambda x: x.get('time', '00:00'))
-            
-            # Move to next day
-            current_date += timedelta(days=1)
-        
-        return schedule
+    def _is_completed_today(medicine, today_str, completion_index):
+        """Helper method to check if a Medicine was taken on today's YYYY-MM-DD date"""
+        return completion_index.is_completed(medicine.id, today_str)
+    
+    @staticmethod
+    def _build_today_medicines(medicines):
+        """Helper method to list today's Medicines sorted by time"""
+        today = datetime.now()
+        today_medicines = []
+        
+        for medicine in medicines:
+            # Check if medicine should be taken today based on schedule
+            if UserService._is_scheduled_today(medicine, today):
+                today_medicines.append(medicine)
+        
+        # Sort by time
+        today_medicines.sort(key=lambda medicine: medicine.minutes)
+        
+        return today_medicines
     
     @staticmethod
-    def _is_scheduled_for_date(medicine, date):
-        """Helper method to determine if medicine is scheduled for a specific date"""
-        frequency = medicine.get('frequency', 'daily')
+    def _build_progress(medicines, completion_index):
+        """Helper method to count today's scheduled and completed Medicines"""
+        today = datetime.now()
+        today_str = today.strftime('%Y-%m-%d')
+        total_count = 0
+        completed_count = 0
+        
+        for medicine in medicines:
+            if UserService._is_scheduled_today(medicine, today):
+                total_count += 1
+                
+                # Check if medicine was taken today
+                if UserService._is_completed_today(medicine, today_str, completion_index):
+                    completed_count += 1
         
-        if frequency == 'daily':
-            return True
+        progress = 0 if total_count == 0 else (completed_count / total_count) * 100
         
-        elif frequency == 'weekly':
-            days = medicine.get('days', [])
-            return date.strftime('%A').lower() in [day.lower() for day in days]
+        return {
+            'total': total_count,
+            'completed': completed_count,
+            'pending': total_count - completed_count,
+            'progress': progress
+        }
+    
+    @staticmethod
+    def _dump_medicines(medicines, history, start_date, end_date):
+        """
+        Helper method to build the responses of Medicines with their history between two dates
         
-        elif frequency == 'monthly':
-            days_of_month = medicine.get('days_of_month', [])
-            return date.day in days_of_month
+        history maps medicine ids to dose events, as returned by DoseEvent.get_history.
+        Entries still embedded in documents that were not migrated yet are kept.
+        """
+        responses = []
         
-        elif frequency == 'specific_dates':
-            dates = medicine.get('dates', [])
-            return date.strftime('%Y-%m-%d') in dates
+        for medicine in medicines:
+            entries = list(medicine.history) + history.get(medicine.id, [])
+            responses.append(MEDICINE.dump(medicine.document, history=[
+                entry for entry in entries
+                if start_date <= entry.get('date', '') <= end_date
+            ]))
         
-        return False
+        return responses
     
     @staticmethod
-    def _is_completed_on_date(medicine, date_str):
-        """Helper method to check if medicine was taken on a specific date"""
-        history = medicine.get('history', [])
-        for entry in history:
-            if entry.get('date') == date_str and entry.get('completed', False):
-                return True
-        
-        return False
\ No newline at end of file
+    def _generate_schedule(medicines, start_date, end_date, completion_index):
+        """Helper method to generate schedule for date range"""
+        return ScheduleMatrix(medicines, start_date, end_date, completion_index).to_schedule()
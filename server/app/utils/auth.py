@@ -1,7 +1,46 @@
 from functools import wraps
+from bson.objectid import ObjectId
 from flask import request, jsonify
+from app.config import Config
 from app.utils.token_utils import decode_token
-from app.database import get_db
+from app.models.user import User
+from app.utils.cache import get_cache
+
+class Principal:
+    """
+    The authenticated user as handed to routes: identity fields only
+    """
+
+    __slots__ = ('id', 'username', 'email', 'first_name', 'last_name', 'onboarding_complete', 'onboarding_step')
+
+    def __init__(self, document):
+        self.id = str(document['_id'])
+        self.username = document.get('username')
+        self.email = document.get('email')
+        self.first_name = document.get('first_name')
+        self.last_name = document.get('last_name')
+        self.onboarding_complete = document.get('onboarding_complete', False)
+        self.onboarding_step = document.get('onboarding_step', 1)
+
+    def to_dict(self):
+        """
+        Get the principal as a response dict
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
+
+def load_principal(user_id):
+    """
+    Get the principal of a user ID, or None if there is no such user
+
+    Reads only the identity fields, and caches the result for
+    PRINCIPAL_CACHE_TTL seconds. Every write to the user invalidates it.
+    """
+    if not ObjectId.is_valid(user_id):
+        return None
+
+    # The identity fields are cached, so every cache backend can store them
+    document = get_cache().cached(user_id, 'principal', lambda: User.get_principal(user_id), Config.PRINCIPAL_CACHE_TTL)
+    return Principal(document) if document else None
 
 def token_required(f):
     @wraps(f)
@@ -25,19 +64,15 @@ def token_required(f):
         try:
             # Decode the token
             payload = decode_token(token)
-            if not payload:
+            if not payload or payload.get('type') != 'access':
                 raise ValueError('Invalid token')
 
-            # Get user from database
-            db = get_db()
-            current_user = db.users.find_one({'_id': payload['user_id']})
-            
+            # Get the principal from the cache or database
+            current_user = load_principal(payload.get('user_id'))
+
             if not current_user:
                 raise ValueError('User not found')
 
-            # Pass the user to the route
-            return f(current_user, *args, **kwargs)
-
         except Exception as e:
             return jsonify({
                 'status': 'error',
@@ -45,4 +80,7 @@ def token_required(f):
                 'error': str(e)
             }), 401
 
-    return decorated 
\ No newline at end of file
+        # Pass the user to the route, errors in the route are not token errors
+        return f(current_user, *args, **kwargs)
+
+    return decorated
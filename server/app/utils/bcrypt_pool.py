@@ -0,0 +1,177 @@
+import os
+import time
+import bcrypt
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+class BcryptPoolBusy(Exception):
+    """
+    Raised when a bcrypt operation cannot be run in time: too many are already
+    waiting, it timed out or the pool broke
+    """
+
+def _hashpw(password, salt_or_hash):
+    # Runs in a pool process, python_bcrypt takes and returns str
+    return bcrypt.hashpw(password, salt_or_hash)
+
+def _hash(password, log_rounds):
+    return _hashpw(password, bcrypt.gensalt(log_rounds=log_rounds))
+
+def _context():
+    # The pool is started inside a worker that already runs driver and sync
+    # threads, and forking it could copy a lock one of them holds. Pool
+    # processes need no inherited state, so they start from a fresh
+    # interpreter, forked from a server that has imported this module.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+class BcryptPool:
+    """
+    Runs bcrypt in a bounded pool of worker processes
+
+    Hashing at cost 12 is a few hundred milliseconds of CPU, so running it in
+    the request thread holds the web worker for that long. With the pool the
+    request thread only waits. At most max_queue operations may be running or
+    waiting at once, further calls raise BcryptPoolBusy instead of piling up.
+    An operation counts until it has actually finished, so requests that timed
+    out do not make room for more work than the pool can do.
+    With processes=0 everything runs inline.
+    """
+
+    # Completed operations between two stats log lines
+    STATS_LOG_INTERVAL = 1000
+
+    def __init__(self, processes=2, max_queue=64, timeout=10):
+        self.processes = processes
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def hash(self, password, log_rounds):
+        """
+        Hash a password with a new salt at the given cost
+        """
+        return self._run(_hash, password, log_rounds)
+
+    def check(self, password, hashed_password):
+        """
+        Verify a password against its hash
+        """
+        return self._run(_hashpw, password, hashed_password) == hashed_password
+
+    def stats(self):
+        """
+        Get the queue depth and throughput counters
+        """
+        with self._lock:
+            return self._stats_locked()
+
+    def _run(self, function, *args):
+        with self._lock:
+            if self.in_flight >= self.max_queue:
+                self.rejected += 1
+                stats = self._stats_locked()
+                busy = True
+            else:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                busy = False
+
+        if busy:
+            logger.warning(f"bcrypt pool full, operation rejected: {stats}")
+            raise BcryptPoolBusy("Too many password operations in progress")
+
+        started = time.monotonic()
+
+        if self.processes <= 0:
+            try:
+                return function(*args)
+            finally:
+                self._finished(started)
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(function, *args)
+        except BrokenProcessPool:
+            self._finished(started, failed=True)
+            self._reset_executor(executor)
+            raise BcryptPoolBusy("Password operations are unavailable")
+
+        # Stays in flight until the worker is done with it, not until we stop waiting
+        future.add_done_callback(lambda future: self._finished(started, failed=future.cancelled() or future.exception() is not None))
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Still queued operations are dropped, running ones finish in the worker
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+                stats = self._stats_locked()
+            logger.warning(f"bcrypt operation timed out after {self.timeout}s: {stats}")
+            raise BcryptPoolBusy("Password operation timed out")
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            logger.error(f"bcrypt pool broke: {self.stats()}")
+            raise BcryptPoolBusy("Password operations are unavailable")
+
+    def _finished(self, started, failed=False):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.failed += 1
+                return
+
+            self.completed += 1
+            self.total_seconds += time.monotonic() - started
+            log_stats = self.completed % self.STATS_LOG_INTERVAL == 0
+            stats = self._stats_locked() if log_stats else None
+
+        if log_stats:
+            logger.info(f"bcrypt pool: {stats}")
+
+    def _stats_locked(self):
+        # Caller holds the lock
+        return {
+            'processes': self.processes,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'failed': self.failed,
+            'average_seconds': self.total_seconds / self.completed if self.completed else None
+        }
+
+    def _reset_executor(self, executor):
+        # A broken pool cannot run anything anymore, the next call starts a new one
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _get_executor(self):
+        # Pre-fork servers fork after import, every worker needs its own pool
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=_context())
+                self._pid = os.getpid()
+            return self._executor
@@ -0,0 +1,355 @@
+import os
+import sqlite3
+import time
+import msgspec
+from abc import ABC, abstractmethod
+from bson import ObjectId
+from collections import OrderedDict
+from threading import Lock, local
+
+cache = None
+
+def _encode_object(obj):
+    # Values are stored in the form clients receive them in
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise NotImplementedError(f"Object of type {type(obj).__name__} cannot be cached")
+
+_encoder = msgspec.msgpack.Encoder(enc_hook=_encode_object)
+_decoder = msgspec.msgpack.Decoder()
+
+def _open_private(path):
+    """
+    Create a file only this user can read and write, in a directory only this
+    user can enter, refusing files owned by someone else or symlinks
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        if hasattr(os, 'getuid') and os.fstat(fd).st_uid != os.getuid():
+            raise RuntimeError(f"Cache file {path} is owned by another user")
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+class CacheBackend(ABC):
+    """
+    Per-user cache of computed values shared by the service layer
+
+    Every user has a version that invalidate(user_id) moves forward. Values are
+    stored with the version read before computing them and are only returned
+    while it is still current, so a value computed from data that changed in
+    the meantime is never served, even when another worker stored it.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def version(self, user_id):
+        """
+        Get the current cache version of a user
+        """
+
+    @abstractmethod
+    def get(self, user_id, key, version):
+        """
+        Get a value stored for a user at a version, or None
+        """
+
+    @abstractmethod
+    def set(self, user_id, key, value, version, ttl=None):
+        """
+        Store a value for a user, ignored if the version is no longer current
+        """
+
+    @abstractmethod
+    def invalidate(self, user_id):
+        """
+        Move the user's version forward, dropping every value stored for them
+        """
+
+    @abstractmethod
+    def clear(self):
+        """
+        Drop every value and reset the counters
+        """
+
+    @abstractmethod
+    def size(self):
+        """
+        Get the number of stored values
+        """
+
+    def cached(self, user_id, key, compute, ttl=None):
+        """
+        Get a value, computing and storing it on a miss
+
+        compute() returning None is not cached.
+        """
+        version = self.version(user_id)
+
+        value = self.get(user_id, key, version)
+        if value is not None:
+            return value
+
+        value = compute()
+        if value is not None:
+            self.set(user_id, key, value, version, ttl)
+
+        return value
+
+    def stats(self):
+        """
+        Get the hit/miss counters of this process and the current size
+        """
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': self.size(),
+            'hit_rate': self.hits / lookups if lookups else None
+        }
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+class MemoryCache(CacheBackend):
+    """
+    In-process LRU cache, private to each worker
+
+    Versions come from one counter for all users. Users without a remembered
+    version share a default one, at most 4 * max_size versions are remembered
+    and forgetting the oldest moves the default past every version handed
+    out, so a value computed before a forgotten write is still never stored.
+    """
+
+    def __init__(self, max_size=2048, ttl=300):
+        super().__init__(ttl)
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._versions = OrderedDict()
+        self._counter = 0
+        self._default_version = 0
+        self._lock = Lock()
+
+    def version(self, user_id):
+        with self._lock:
+            return self._versions.get(str(user_id), self._default_version)
+
+    def get(self, user_id, key, version):
+        entry_key = (str(user_id), key)
+
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            hit = (
+                entry is not None
+                and entry[0] > time.monotonic()
+                and entry[1] == self._versions.get(str(user_id), self._default_version)
+                and entry[1] == version
+            )
+
+            if hit:
+                self._entries.move_to_end(entry_key)
+            elif entry is not None:
+                self._remove(entry_key)
+
+            self._count(hit)
+            return entry[2] if hit else None
+
+    def set(self, user_id, key, value, version, ttl=None):
+        entry_key = (str(user_id), key)
+        expires_at = time.monotonic() + (ttl or self.ttl)
+
+        with self._lock:
+            if version != self._versions.get(str(user_id), self._default_version):
+                return
+
+            self._entries[entry_key] = (expires_at, version, value)
+            self._entries.move_to_end(entry_key)
+            self._user_keys.setdefault(entry_key[0], set()).add(entry_key)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+
+        with self._lock:
+            self._counter += 1
+            self._versions[user_id] = self._counter
+            self._versions.move_to_end(user_id)
+            for entry_key in self._user_keys.pop(user_id, ()):
+                self._entries.pop(entry_key, None)
+
+            # Forget the older half at once, so the default moves rarely
+            if len(self._versions) > 4 * self.max_size:
+                for _ in range(len(self._versions) // 2):
+                    self._versions.popitem(last=False)
+                self._counter += 1
+                self._default_version = self._counter
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def size(self):
+        return len(self._entries)
+
+    def _remove(self, entry_key):
+        # Caller holds the lock
+        self._entries.pop(entry_key, None)
+        user_keys = self._user_keys.get(entry_key[0])
+        if user_keys is not None:
+            user_keys.discard(entry_key)
+            if not user_keys:
+                del self._user_keys[entry_key[0]]
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache shared by every worker process on a host, in a SQLite database in
+    WAL mode so readers never wait for a writer
+
+    Values are stored as msgpack in their JSON form, so ObjectIds, dates and
+    datetimes come back as the strings clients receive. The database is only
+    readable by the user the app runs as. Expired values and, past max_size,
+    the values closest to expiring are removed every PRUNE_INTERVAL writes of
+    a process.
+    """
+
+    PRUNE_INTERVAL = 256
+
+    def __init__(self, path, max_size=20000, ttl=300):
+        super().__init__(ttl)
+        self.path = path
+        self.max_size = max_size
+        self._local = local()
+        self._writes = 0
+
+        _open_private(path)
+
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS versions ('
+                'user_id TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'user_id TEXT NOT NULL, key TEXT NOT NULL, version INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL, value BLOB NOT NULL, PRIMARY KEY (user_id, key))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)')
+
+    def _connect(self):
+        # Connections are per thread, and must not be inherited across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def version(self, user_id):
+        row = self._connect().execute(
+            'SELECT version FROM versions WHERE user_id = ?',
+            (str(user_id),)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, user_id, key, version):
+        row = self._connect().execute(
+            'SELECT e.value FROM entries e LEFT JOIN versions v ON v.user_id = e.user_id '
+            'WHERE e.user_id = ? AND e.key = ? AND e.version = ? '
+            'AND e.version = COALESCE(v.version, 0) AND e.expires_at > ?',
+            (str(user_id), key, version, time.time())
+        ).fetchone()
+
+        self._count(row is not None)
+        return _decoder.decode(row[0]) if row else None
+
+    def set(self, user_id, key, value, version, ttl=None):
+        user_id = str(user_id)
+        value = _encoder.encode(value)
+
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (user_id, key, version, expires_at, value) '
+                'SELECT ?, ?, ?, ?, ? '
+                'WHERE ? = COALESCE((SELECT version FROM versions WHERE user_id = ?), 0)',
+                (user_id, key, version, time.time() + (ttl or self.ttl), value, version, user_id)
+            )
+
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            self._prune()
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO versions (user_id, version) VALUES (?, 1) '
+                'ON CONFLICT (user_id) DO UPDATE SET version = version + 1',
+                (user_id,)
+            )
+            conn.execute('DELETE FROM entries WHERE user_id = ?', (user_id,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries')
+        self.hits = 0
+        self.misses = 0
+
+    def size(self):
+        return self._connect().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def _prune(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+            conn.execute(
+                'DELETE FROM entries WHERE rowid IN ('
+                'SELECT rowid FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_size,)
+            )
+
+def init_cache(app):
+    global cache
+
+    backend = app.config.get('CACHE_BACKEND', 'memory')
+    max_size = app.config.get('CACHE_SIZE', 2048)
+    ttl = app.config.get('CACHE_TTL', 300)
+
+    if backend == 'sqlite':
+        cache = SQLiteCache(app.config.get('CACHE_PATH'), max_size, ttl)
+    elif backend == 'memory':
+        cache = MemoryCache(max_size, ttl)
+    else:
+        raise ValueError(f"Unknown cache backend: {backend}")
+
+    app.logger.info(f"Using {backend} cache")
+
+    return cache
+
+def get_cache():
+    global cache
+
+    # Code running outside the app, such as scripts, gets a private cache
+    if cache is None:
+        cache = MemoryCache()
+
+    return cache
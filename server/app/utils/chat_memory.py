@@ -0,0 +1,147 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from app.config import Config
+from app.models.chat_message import ChatMessage
+
+def estimate_tokens(text):
+    """
+    Rough token count of a text, about four characters per token
+    """
+    return len(text) // 4 + 1
+
+# Messages are re-read this many seconds back on each sync, so those written by
+# a worker whose clock is slightly behind are not missed
+SYNC_OVERLAP = 60
+
+class ChatMemory:
+    """
+    Conversation history of each user for the chat agent
+
+    A session keeps the latest messages that fit in CHAT_MEMORY_TOKEN_BUDGET,
+    so prompts stop growing after a few exchanges. Sessions unused for
+    CHAT_MEMORY_IDLE_TTL seconds end and are evicted, at most
+    CHAT_MEMORY_MAX_SESSIONS are kept. Every exchange is also written to the
+    capped chat_messages collection. Each request reads the messages written
+    since the session's previous sync, so exchanges answered by other workers
+    or before a restart are part of the conversation too.
+    """
+
+    def __init__(self):
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+
+    def history(self, user_id):
+        """
+        Get the messages of the user's session as (role, text), oldest first
+        """
+        now = time.monotonic()
+        started = datetime.utcnow()
+
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(user_id)
+            if session is not None:
+                since = session['synced'] - timedelta(seconds=SYNC_OVERLAP)
+            else:
+                since = started - timedelta(seconds=Config.CHAT_MEMORY_IDLE_TTL)
+
+        try:
+            documents = ChatMessage.find_recent(user_id, since, Config.CHAT_MEMORY_MAX_MESSAGES)
+        except Exception as e:
+            print(f"Error loading chat messages: {str(e)}")
+            documents = None
+
+        with self._lock:
+            # A concurrent request may have started the session meanwhile
+            session = self._sessions.setdefault(user_id, {'messages': [], 'seen': {}, 'synced': since})
+            if documents is not None:
+                session['synced'] = max(session['synced'], started)
+                _merge(session, documents)
+            session['used'] = now
+            self._sessions.move_to_end(user_id)
+            while len(self._sessions) > Config.CHAT_MEMORY_MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+            return [(role, text) for _, _, role, text in session['messages']]
+
+    def add_exchange(self, user_id, prompt, response):
+        """
+        Add a prompt and its response to the user's session
+        """
+        try:
+            documents = ChatMessage.add_exchange(user_id, prompt, response)
+        except Exception as e:
+            print(f"Error saving chat messages: {str(e)}")
+            documents = [{'role': 'human', 'text': prompt}, {'role': 'ai', 'text': response}]
+
+        # Sessions that ended are loaded from the collection on the next request
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                _merge(session, documents)
+                session['used'] = time.monotonic()
+                self._sessions.move_to_end(user_id)
+
+    def clear(self):
+        """
+        Forget all sessions held by this process
+        """
+        with self._lock:
+            self._sessions.clear()
+
+    def _evict_idle(self, now):
+        # Sessions are ordered by last use, so the idle ones come first
+        expired = now - Config.CHAT_MEMORY_IDLE_TTL
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session['used'] > expired:
+                break
+            self._sessions.popitem(last=False)
+
+def _merge(session, documents):
+    # Add the messages the session does not have yet, in the order they were
+    # written. Only ids that the next sync can return again are remembered.
+    seen = session['seen']
+    now = datetime.utcnow()
+    messages = list(session['messages'])
+    for document in documents:
+        if '_id' in document:
+            if document['_id'] in seen:
+                continue
+            seen[document['_id']] = document['created_at']
+        messages.append((document.get('created_at', now), str(document.get('_id', '')), document['role'], document['text']))
+
+    messages.sort(key=lambda message: message[:2])
+    kept = _window([(role, text) for _, _, role, text in messages])
+    session['messages'] = messages[len(messages) - len(kept):]
+
+    oldest = session['synced'] - timedelta(seconds=SYNC_OVERLAP)
+    session['seen'] = {_id: created_at for _id, created_at in seen.items() if created_at >= oldest}
+
+def _window(messages):
+    # Keep the latest messages within the message limit and token budget
+    messages = messages[-Config.CHAT_MEMORY_MAX_MESSAGES:]
+    budget = Config.CHAT_MEMORY_TOKEN_BUDGET
+
+    start = len(messages)
+    while start > 0:
+        budget -= estimate_tokens(messages[start - 1][1])
+        if budget < 0:
+            break
+        start -= 1
+
+    # Do not start with a response whose prompt was dropped
+    if start < len(messages) and messages[start][0] == 'ai':
+        start += 1
+
+    return messages[start:]
+
+def format_history(messages):
+    """
+    Format messages as a transcript for the prompt
+    """
+    names = {'human': 'Human', 'ai': 'AI'}
+    return "\n".join(f"{names.get(role, role)}: {text}" for role, text in messages)
+
+chat_memory = ChatMemory()
@@ -0,0 +1,62 @@
+from app.models.dose_event import DoseEvent
+
+class CompletionIndex:
+    """
+    Lookup from (medicine_id, date) to completion status, built once per request
+
+    Combines the dose_events collection with history still embedded in
+    medicine documents that have not been migrated yet, so checking a
+    (medicine, date) pair no longer scans a history list.
+    """
+
+    __slots__ = ('_dates',)
+
+    def __init__(self):
+        self._dates = {}
+
+    def add(self, medicine_id, date):
+        """
+        Record that a medicine was taken on a YYYY-MM-DD date
+        """
+        self._dates.setdefault(str(medicine_id), set()).add(date)
+
+    def is_completed(self, medicine_id, date):
+        """
+        Check if a medicine was taken on a YYYY-MM-DD date
+        """
+        dates = self._dates.get(str(medicine_id))
+        return dates is not None and date in dates
+
+    def dates_for(self, medicine_id):
+        """
+        Get the set of dates a medicine was taken on
+        """
+        return self._dates.get(str(medicine_id), set())
+
+    @classmethod
+    def build(cls, user_id, medicines, start_date, end_date):
+        """
+        Build the index for a user's Medicine list between two dates (inclusive)
+        """
+        events = DoseEvent.find_in_range(user_id, start_date, end_date, completed=True)
+        return cls.from_events(events, medicines, start_date, end_date)
+
+    @classmethod
+    def from_events(cls, events, medicines, start_date, end_date):
+        """
+        Build the index from already loaded dose events between two dates (inclusive)
+        """
+        index = cls()
+
+        for event in events:
+            if event.get('completed', False):
+                index.add(event['medicine_id'], event['date'])
+
+        # History embedded before the dose_events migration
+        for medicine in medicines:
+            for entry in medicine.history:
+                date = entry.get('date')
+                if entry.get('completed', False) and date and start_date <= date <= end_date:
+                    index.add(medicine.id, date)
+
+        return index
@@ -0,0 +1,54 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from email_validator import validate_email, EmailNotValidError
+from app.config import Config
+
+# Maximum number of domains whose deliverability is remembered
+DOMAIN_CACHE_SIZE = 4096
+
+_domains = OrderedDict()
+_domains_lock = Lock()
+
+def normalize_email(email):
+    """
+    Validate the syntax of an email address without any network access
+
+    When EMAIL_CHECK_DELIVERABILITY is set, the domain is also checked for
+    mail servers, at most once per EMAIL_DOMAIN_CACHE_TTL seconds per domain.
+
+    Returns the normalized address
+    Raises EmailNotValidError
+    """
+    valid = validate_email(email, check_deliverability=False)
+
+    if Config.EMAIL_CHECK_DELIVERABILITY:
+        error = _domain_error(valid.ascii_domain, email)
+        if error:
+            raise EmailNotValidError(error)
+
+    return valid.normalized
+
+def _domain_error(domain, email):
+    now = time.monotonic()
+
+    with _domains_lock:
+        entry = _domains.get(domain)
+        if entry is not None and entry[0] > now:
+            _domains.move_to_end(domain)
+            return entry[1]
+
+    # The DNS lookup runs outside the lock, concurrent misses may both look up
+    try:
+        validate_email(email, check_deliverability=True)
+        error = None
+    except EmailNotValidError as e:
+        error = str(e)
+
+    with _domains_lock:
+        _domains[domain] = (now + Config.EMAIL_DOMAIN_CACHE_TTL, error)
+        _domains.move_to_end(domain)
+        while len(_domains) > DOMAIN_CACHE_SIZE:
+            _domains.popitem(last=False)
+
+    return error
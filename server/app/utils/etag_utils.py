@@ -0,0 +1,71 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import g, has_request_context, request, current_app, make_response
+from app.models.user import User
+
+def make_etag(user_id, data_version):
+    """
+    Build the ETag of the current request for a user's data version
+
+    The date is part of the tag because "today" views and default date ranges
+    change at midnight without any write.
+    """
+    parts = [
+        str(user_id),
+        str(data_version),
+        datetime.now().strftime('%Y-%m-%d'),
+        request.full_path,
+        str(request.accept_mimetypes)
+    ]
+    return hashlib.sha1(':'.join(parts).encode('utf-8')).hexdigest()
+
+def request_data_version(user_id):
+    """
+    Get the user's data version, reading it only if conditional_get has not
+    already read it for this request
+    """
+    if has_request_context():
+        versions = g.get('data_versions')
+        if versions is not None and str(user_id) in versions:
+            return versions[str(user_id)]
+
+    return User.get_data_version(user_id)
+
+def conditional_get(f):
+    """
+    Decorator for GET routes that only depend on the user's own data
+
+    Answers 304 Not Modified after a version-only query when the client's
+    If-None-Match matches, so the document is neither loaded nor serialized.
+    Must be applied below token_required, which provides user_id. The version
+    is kept for the request, see request_data_version.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        user_id = kwargs.get('user_id')
+        data_version = User.get_data_version(user_id)
+        g.data_versions = {str(user_id): data_version}
+
+        # Let the route produce its own error for unknown users
+        if data_version is None:
+            return f(*args, **kwargs)
+
+        etag = make_etag(user_id, data_version)
+
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.vary.add('Authorization')
+        response.vary.add('Accept')
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+        return response
+
+    return decorated
@@ -3,15 +3,46 @@ from bson import ObjectId
 from datetime import datetime, date
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 class MongoJSONProvider(JSONProvider):
     """Custom JSON provider that handles MongoDB ObjectId and datetime serialization for Flask 3.1.0+."""
     
+    def __init__(self, app):
+        super().__init__(app)
+        # orjson encodes datetime and date natively, only ObjectId reaches the
+        # callback. Its output is compact and writes non-ASCII characters,
+        # floats and NaN differently, so clients must not depend on the exact
+        # bytes. The stdlib path writes what this provider always has.
+        self.use_orjson = orjson is not None and app.config.get('JSON_USE_ORJSON', False)
+    
     def dumps(self, obj, **kwargs):
-        return json.dumps(obj, default=self._handle_object, **kwargs)
+        return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+    
+    def dumps_bytes(self, obj, **kwargs):
+        # Extra json.dumps options are only supported by the stdlib path
+        if self.use_orjson and not kwargs:
+            try:
+                return orjson.dumps(obj, default=self._handle_object)
+            except TypeError:
+                # Values orjson does not support, such as integers over 64 bits
+                pass
+        
+        return json.dumps(obj, default=self._handle_object, **kwargs).encode('utf-8')
     
     def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
         return json.loads(s, **kwargs)
     
+    def response(self, *args, **kwargs):
+        # Skip the str round trip of the base class
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype='application/json')
+    
     def _handle_object(self, obj):
         if isinstance(obj, ObjectId):
             return str(obj)
@@ -23,4 +54,4 @@ class MongoJSONProvider(JSONProvider):
         except (TypeError, ValueError):
             pass
         # If no conversion is available
-        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
\ No newline at end of file
@@ -0,0 +1,46 @@
+import sys
+from app.utils.recurrence import get_recurrence
+
+class Medicine:
+    """
+    Compact read-only view of a medicine document for schedule computations
+
+    Built once per request from the projected document: the id is an interned
+    str, time is also parsed to minutes since midnight for sorting and the
+    frequency is compiled to a Recurrence, so inner loops do attribute reads
+    instead of dict lookups with defaults. document keeps the original for
+    building responses.
+    """
+
+    __slots__ = ('id', 'name', 'dosage', 'time', 'minutes', 'recurrence', 'document')
+
+    def __init__(self, document):
+        self.id = sys.intern(str(document.get('_id')))
+        self.name = document.get('name')
+        self.dosage = document.get('dosage')
+        self.time = document.get('time', '00:00')
+        self.minutes = _parse_minutes(self.time)
+        self.recurrence = get_recurrence(document)
+        self.document = document
+
+    @property
+    def history(self):
+        """
+        History still embedded in a document that was not migrated yet
+        """
+        return self.document.get('history') or ()
+
+    @classmethod
+    def from_documents(cls, documents):
+        """
+        Build the medicines of a list of documents
+        """
+        return [cls(document) for document in documents]
+
+def _parse_minutes(value):
+    # Unparseable times sort first, like the '00:00' default
+    try:
+        hours, minutes = value.split(':')
+        return int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        return 0
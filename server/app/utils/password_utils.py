@@ -1,21 +1,32 @@
-import bcrypt
 from app.config import Config
+from app.utils.bcrypt_pool import BcryptPool
+
+# Hashing runs in worker processes, see BcryptPool
+bcrypt_pool = BcryptPool(
+    processes=Config.BCRYPT_POOL_PROCESSES,
+    max_queue=Config.BCRYPT_POOL_QUEUE,
+    timeout=Config.BCRYPT_POOL_TIMEOUT
+)
 
 def hash_password(password):
     """
-    Hash a password for storing
+    Hash a password for storing, at the cost set by BCRYPT_LOG_ROUNDS
+    
+    Raises BcryptPoolBusy when too many password operations are waiting,
+    it timed out or the pool is broken
     """
     # For python_bcrypt, the password must be a string, not bytes
     if isinstance(password, bytes):
         password = password.decode('utf-8')
     
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password, salt)
-    return hashed
+    return bcrypt_pool.hash(password, Config.BCRYPT_LOG_ROUNDS)
 
 def check_password(password, hashed_password):
     """
     Verify a password against its hash
+    
+    Raises BcryptPoolBusy when too many password operations are waiting,
+    it timed out or the pool is broken
     """
     # For python_bcrypt, the password must be a string, not bytes
     if isinstance(password, bytes):
@@ -25,7 +36,22 @@ def check_password(password, hashed_password):
         hashed_password = hashed_password.decode('utf-8')
     
     # Use hashpw to compare instead of checkpw which doesn't exist in python_bcrypt
-    return bcrypt.hashpw(password, hashed_password) == hashed_password
+    return bcrypt_pool.check(password, hashed_password)
+
+def needs_rehash(hashed_password):
+    """
+    Check if a hash was made at a different cost than BCRYPT_LOG_ROUNDS
+    """
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode('utf-8')
+    
+    # Hashes look like $2a$12$<salt and hash>
+    try:
+        log_rounds = int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    
+    return log_rounds != Config.BCRYPT_LOG_ROUNDS
     
 def verify_password(stored_password, provided_password):
     """
@@ -39,7 +65,7 @@ def verify_password(stored_password, provided_password):
         stored_password = stored_password.decode('utf-8')
     
     # Use hashpw to compare instead of checkpw which doesn't exist in python_bcrypt    
-    return bcrypt.hashpw(provided_password, stored_password) == stored_password
+    return bcrypt_pool.check(provided_password, stored_password)
 
 def validate_password(password):
     """
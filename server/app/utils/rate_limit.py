@@ -0,0 +1,214 @@
+import math
+import time
+from datetime import datetime
+from functools import wraps
+from threading import Lock
+from flask import request, jsonify
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+def parse_limits(value):
+    """
+    Parse limits like "10 per minute" or "200 per day; 50 per hour"
+
+    Returns a list of (amount, window in seconds)
+    """
+    limits = []
+
+    for part in value.split(';'):
+        part = part.strip()
+        if not part:
+            continue
+
+        try:
+            amount, per, period = part.split()
+            if per != 'per':
+                raise ValueError
+            window = PERIODS[period.rstrip('s')]
+            limits.append((int(amount), window))
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid rate limit: {part}")
+
+    return limits
+
+class MemoryRateLimitStore:
+    """
+    Counters in this process only, for development and tests
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = Lock()
+
+    def hit(self, key, bucket, window):
+        """
+        Count a request in a bucket and return the bucket's new count
+        """
+        with self._lock:
+            count = self._counts.get((key, window, bucket), 0) + 1
+            self._counts[(key, window, bucket)] = count
+
+            # Buckets older than the previous one of their own window are never
+            # read again
+            if len(self._counts) > 100000:
+                now = time.time()
+                self._counts = {k: v for k, v in self._counts.items() if k[2] >= now // k[1] - 1}
+
+            return count
+
+    def count(self, key, bucket, window):
+        """
+        Get the count of a bucket
+        """
+        return self._counts.get((key, window, bucket), 0)
+
+class MongoRateLimitStore:
+    """
+    Counters shared by every process and node, one document per key and window
+
+    Each request is a single atomic $inc upsert. Documents carry an expires_at
+    the rate_limits TTL index removes them at, so the collection stays small.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def hit(self, key, bucket, window):
+        query = {'_id': f'{key}:{bucket}'}
+        update = {
+            '$inc': {'count': 1},
+            # Kept while it still serves as the previous window
+            '$setOnInsert': {'expires_at': datetime.utcfromtimestamp((bucket + 2) * window)}
+        }
+
+        try:
+            document = self.collection.find_one_and_update(
+                query, update, {'count': 1}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another request inserted the same bucket first, it exists now
+            document = self.collection.find_one_and_update(
+                query, update, {'count': 1}, return_document=ReturnDocument.AFTER
+            )
+
+        return document['count']
+
+    def count(self, key, bucket, window):
+        document = self.collection.find_one({'_id': f'{key}:{bucket}'}, {'count': 1})
+        return document['count'] if document else 0
+
+class RateLimiter:
+    """
+    Sliding window rate limiter for every blueprint
+
+    A route uses the limits given with @limiter.limit, otherwise those of its
+    blueprint in RATELIMIT_POLICIES, otherwise RATELIMIT_DEFAULT. Requests are
+    counted per client address in fixed windows, and the previous window is
+    weighted by how much of it still overlaps the sliding window.
+    """
+
+    # Completed windows no longer change, so their counts are kept in memory
+    PREVIOUS_CACHE_SIZE = 10000
+
+    def __init__(self):
+        self.store = None
+        self.enabled = False
+        self.default_limits = []
+        self.policies = {}
+        self._previous = {}
+
+    def init_app(self, app, store=None):
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        self.default_limits = parse_limits(app.config.get('RATELIMIT_DEFAULT', ''))
+        self.policies = {
+            blueprint: parse_limits(limits)
+            for blueprint, limits in app.config.get('RATELIMIT_POLICIES', {}).items()
+        }
+
+        if store is not None:
+            self.store = store
+        elif app.config.get('RATELIMIT_STORAGE', 'memory') == 'mongo':
+            from app.database import get_db
+            self.store = MongoRateLimitStore(get_db().rate_limits)
+        else:
+            self.store = MemoryRateLimitStore()
+
+        app.before_request(self._check_request)
+
+    def limit(self, limits):
+        """
+        Decorator giving a route its own limits, such as "10 per minute"
+        """
+        parsed = parse_limits(limits)
+
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                return f(*args, **kwargs)
+
+            decorated._rate_limits = parsed
+            return decorated
+
+        return decorator
+
+    def hit(self, key, amount, window):
+        """
+        Count a request against a limit
+
+        Returns the seconds to wait when the limit is exceeded, or 0
+        """
+        now = time.time()
+        bucket = int(now // window)
+        elapsed = now - bucket * window
+
+        current = self.store.hit(key, bucket, window)
+
+        previous_key = (key, bucket - 1)
+        previous = self._previous.get(previous_key)
+        if previous is None:
+            previous = self.store.count(key, bucket - 1, window)
+            if len(self._previous) >= self.PREVIOUS_CACHE_SIZE:
+                self._previous.clear()
+            self._previous[previous_key] = previous
+
+        if previous * (window - elapsed) / window + current <= amount:
+            return 0
+
+        return max(1, math.ceil(window - elapsed))
+
+    def _check_request(self):
+        if not self.enabled or request.method == 'OPTIONS' or request.endpoint is None:
+            return None
+
+        from flask import current_app
+        view = current_app.view_functions.get(request.endpoint)
+        limits = getattr(view, '_rate_limits', None)
+        scope = request.endpoint
+
+        if limits is None:
+            limits = self.policies.get(request.blueprint)
+            scope = request.blueprint
+        if limits is None:
+            limits = self.default_limits
+            scope = 'default'
+
+        for amount, window in limits:
+            key = f'{scope}:{amount}/{window}:{request.remote_addr}'
+            retry_after = self.hit(key, amount, window)
+
+            if retry_after:
+                response = jsonify({'message': 'Too many requests, please try again later'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+
+        return None
+
+limiter = RateLimiter()
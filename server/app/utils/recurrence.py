@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+
+WEEKDAYS = {
+    'monday': 0,
+    'tuesday': 1,
+    'wednesday': 2,
+    'thursday': 3,
+    'friday': 4,
+    'saturday': 5,
+    'sunday': 6
+}
+
+# Maximum number of compiled recurrences kept in memory
+CACHE_SIZE = 4096
+
+class Recurrence:
+    """
+    Compiled form of a medicine's frequency so that checking a date is O(1)
+
+    weekday_mask has bit n set for date.weekday() == n, month_day_mask has bit n
+    set for day of month n and dates holds the ordinals of specific dates.
+    """
+
+    __slots__ = ('daily', 'weekday_mask', 'month_day_mask', 'dates')
+
+    def __init__(self, daily=False, weekday_mask=0, month_day_mask=0, dates=frozenset()):
+        self.daily = daily
+        self.weekday_mask = weekday_mask
+        self.month_day_mask = month_day_mask
+        self.dates = dates
+
+    def occurs_on(self, day):
+        """
+        Check if the medicine is scheduled on a date or datetime
+        """
+        if self.daily:
+            return True
+
+        return bool(
+            (self.weekday_mask >> day.weekday()) & 1
+            or (self.month_day_mask >> day.day) & 1
+            or day.toordinal() in self.dates
+        )
+
+    @classmethod
+    def compile(cls, medicine):
+        """
+        Build the recurrence for a medicine document
+        """
+        frequency = medicine.get('frequency', 'daily')
+
+        if frequency == 'daily':
+            return cls(daily=True)
+
+        elif frequency == 'weekly':
+            weekday_mask = 0
+            for day in medicine.get('days', []):
+                weekday = WEEKDAYS.get(str(day).lower())
+                if weekday is not None:
+                    weekday_mask |= 1 << weekday
+            return cls(weekday_mask=weekday_mask)
+
+        elif frequency == 'monthly':
+            month_day_mask = 0
+            for day in medicine.get('days_of_month', []):
+                if isinstance(day, int) and 1 <= day <= 31:
+                    month_day_mask |= 1 << day
+            return cls(month_day_mask=month_day_mask)
+
+        elif frequency == 'specific_dates':
+            dates = set()
+            for value in medicine.get('dates', []):
+                try:
+                    parsed = datetime.strptime(value, '%Y-%m-%d')
+                except (TypeError, ValueError):
+                    continue
+                # strptime also accepts unpadded values which never matched before
+                if parsed.strftime('%Y-%m-%d') == value:
+                    dates.add(parsed.toordinal())
+            return cls(dates=frozenset(dates))
+
+        # Unknown frequencies are never scheduled
+        return cls()
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+def _cache_key(medicine):
+    if medicine.get('_id') is None:
+        return None
+
+    # updated_at changes on every write, so edited medicines get a new entry.
+    # MongoDB stores milliseconds, so truncate to match values read back.
+    updated_at = medicine.get('updated_at')
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.replace(microsecond=updated_at.microsecond // 1000 * 1000)
+
+    return str(medicine['_id']), updated_at
+
+def get_recurrence(medicine):
+    """
+    Get the compiled recurrence for a medicine, compiling it on first use
+    """
+    key = _cache_key(medicine)
+    if key is None:
+        return Recurrence.compile(medicine)
+
+    with _cache_lock:
+        recurrence = _cache.get(key)
+        if recurrence is not None:
+            _cache.move_to_end(key)
+            return recurrence
+
+    return cache_recurrence(medicine)
+
+def cache_recurrence(medicine):
+    """
+    Compile a medicine's recurrence and store it, used when a medicine is written
+    """
+    recurrence = Recurrence.compile(medicine)
+    key = _cache_key(medicine)
+    if key is None:
+        return recurrence
+
+    with _cache_lock:
+        _cache[key] = recurrence
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return recurrence
@@ -0,0 +1,128 @@
+import msgspec
+from datetime import datetime
+from typing import Annotated, Literal, Union
+from app.utils.recurrence import WEEKDAYS
+
+Name = Annotated[str, msgspec.Meta(min_length=1, max_length=200)]
+Dosage = Annotated[str, msgspec.Meta(min_length=1, max_length=100)]
+Notes = Annotated[str, msgspec.Meta(max_length=2000)]
+TimeOfDay = Annotated[str, msgspec.Meta(pattern=r'^([01][0-9]|2[0-3]):[0-5][0-9]$')]
+DateString = Annotated[str, msgspec.Meta(pattern=r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$')]
+DayOfMonth = Annotated[int, msgspec.Meta(ge=1, le=31)]
+Frequency = Literal['daily', 'weekly', 'monthly', 'specific_dates']
+ObjectIdString = Annotated[str, msgspec.Meta(pattern=r'^[0-9a-fA-F]{24}$')]
+
+# Maximum number of entries in days, days_of_month and dates
+MAX_RECURRENCE_ENTRIES = 366
+
+# Fields the server manages, ignored when a client sends a medicine back as it got it
+SERVER_FIELDS = ('_id', 'created_at', 'updated_at', 'history', 'version', 'last_status', 'last_taken')
+
+# The list each frequency is scheduled by
+RECURRENCE_FIELDS = {
+    'weekly': 'days',
+    'monthly': 'days_of_month',
+    'specific_dates': 'dates'
+}
+
+def recurrence_error(medicine):
+    """
+    Check that a medicine has the list its frequency is scheduled by
+
+    Updates are checked merged with the stored medicine, since they may only
+    change the frequency.
+
+    Returns:
+        str: The error message, or None if the medicine can be scheduled
+    """
+    frequency = medicine.get('frequency')
+    required = RECURRENCE_FIELDS.get(frequency)
+    if required and not medicine.get(required):
+        return f"{required} is required for {frequency} frequency"
+    return None
+
+class MedicineUpdate(msgspec.Struct, forbid_unknown_fields=True):
+    """
+    Fields a client may set on a medicine, all optional for partial updates
+    """
+
+    name: Union[Name, msgspec.UnsetType] = msgspec.UNSET
+    dosage: Union[Dosage, msgspec.UnsetType] = msgspec.UNSET
+    time: Union[TimeOfDay, msgspec.UnsetType] = msgspec.UNSET
+    frequency: Union[Frequency, msgspec.UnsetType] = msgspec.UNSET
+    days: Union[Annotated[list[str], msgspec.Meta(max_length=7)], msgspec.UnsetType] = msgspec.UNSET
+    days_of_month: Union[Annotated[list[DayOfMonth], msgspec.Meta(max_length=31)], msgspec.UnsetType] = msgspec.UNSET
+    dates: Union[Annotated[list[DateString], msgspec.Meta(max_length=MAX_RECURRENCE_ENTRIES)], msgspec.UnsetType] = msgspec.UNSET
+    notes: Union[Notes, msgspec.UnsetType] = msgspec.UNSET
+
+    def __post_init__(self):
+        # Stored lowercase, sorted and without duplicates
+        if self.days is not msgspec.UNSET:
+            days = {str(day).strip().lower() for day in self.days}
+            unknown = days - WEEKDAYS.keys()
+            if unknown:
+                raise ValueError(f"Unknown day: {sorted(unknown)[0]}")
+            self.days = sorted(days, key=WEEKDAYS.get)
+
+        if self.days_of_month is not msgspec.UNSET:
+            self.days_of_month = sorted(set(self.days_of_month))
+
+        if self.dates is not msgspec.UNSET:
+            for value in self.dates:
+                try:
+                    datetime.strptime(value, '%Y-%m-%d')
+                except ValueError:
+                    raise ValueError(f"Invalid date: {value}")
+            self.dates = sorted(set(self.dates))
+
+class NewMedicine(MedicineUpdate, forbid_unknown_fields=True):
+    """
+    A new medicine, name, dosage, time and frequency are required
+    """
+
+    def __post_init__(self):
+        for field in ('name', 'dosage', 'time', 'frequency'):
+            if getattr(self, field) is msgspec.UNSET:
+                raise ValueError(f"Missing required field: {field}")
+        super().__post_init__()
+
+        error = recurrence_error(msgspec.structs.asdict(self))
+        if error:
+            raise ValueError(error)
+
+class DoseStatus(msgspec.Struct, forbid_unknown_fields=True):
+    """
+    Body of a medicine status update
+    """
+
+    completed: bool
+
+class Dose(msgspec.Struct, forbid_unknown_fields=True):
+    """
+    A dose recorded by a client while offline
+    """
+
+    medicine_id: ObjectIdString
+    completed: bool
+    date: DateString
+    time: Union[TimeOfDay, None] = None
+
+    def __post_init__(self):
+        try:
+            datetime.strptime(self.date, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"Invalid date: {self.date}")
+
+def decode(data, schema):
+    """
+    Validate a decoded JSON body against a schema
+
+    Returns:
+        tuple: (dict of the set fields, None) or (None, error message)
+    """
+    try:
+        payload = msgspec.convert(data, type=schema)
+    except msgspec.ValidationError as e:
+        return None, str(e)
+
+    return msgspec.to_builtins(payload), None
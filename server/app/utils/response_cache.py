@@ -0,0 +1,103 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from app.config import Config
+from app.models.chat_response import ChatResponse
+
+class ResponseCache:
+    """
+    Cache of chat responses by normalized prompt
+
+    Each worker keeps up to CHAT_CACHE_SIZE responses in an LRU, backed by
+    the chat_responses collection shared by all workers and nodes. Entries
+    expire CHAT_CACHE_TTL seconds after the answer was generated.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def get(self, prompt):
+        """
+        Get the cached response to a normalized prompt, or None
+        """
+        key = _key(prompt)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        try:
+            document = ChatResponse.find(key)
+        except Exception as e:
+            print(f"Error reading cached chat response: {str(e)}")
+            document = None
+
+        with self._lock:
+            if document is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.db_hits += 1
+            expires = document['expires_at'].replace(tzinfo=timezone.utc).timestamp()
+            self._put(key, expires, document['response'])
+            return document['response']
+
+    def set(self, prompt, response):
+        """
+        Cache the response to a normalized prompt
+        """
+        key = _key(prompt)
+
+        with self._lock:
+            self._put(key, time.time() + Config.CHAT_CACHE_TTL, response)
+
+        try:
+            expires_at = datetime.utcnow() + timedelta(seconds=Config.CHAT_CACHE_TTL)
+            ChatResponse.save(key, prompt, response, expires_at)
+        except Exception as e:
+            print(f"Error saving cached chat response: {str(e)}")
+
+    def bypass(self):
+        """
+        Count a prompt that could not use the cache
+        """
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self):
+        """
+        Get the hit/miss counters of this process and the current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'size': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else None
+            }
+
+    def _put(self, key, expires, response):
+        self._entries[key] = (expires, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > Config.CHAT_CACHE_SIZE:
+            self._entries.popitem(last=False)
+
+def _key(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+response_cache = ResponseCache()
@@ -0,0 +1,69 @@
+class ResponseSchema:
+    """
+    Precompiled field map turning a stored document into a response dict
+
+    Either lists the fields to return, as names or (response name, document
+    name) pairs, or returns every field except the excluded ones. convert maps
+    response names to functions applied to the value. dump() builds the
+    response in a single pass over the document, so no copy of the document
+    is made and sensitive fields never reach the encoder.
+    """
+
+    __slots__ = ('fields', 'exclude', 'convert')
+
+    def __init__(self, fields=None, exclude=(), convert=None):
+        if fields is not None:
+            fields = tuple(
+                (field, field) if isinstance(field, str) else tuple(field)
+                for field in fields
+            )
+        self.fields = fields
+        self.exclude = frozenset(exclude)
+        self.convert = dict(convert or {})
+
+    def dump(self, document, **extra):
+        """
+        Build the response for a document, extra fields are added as is
+        """
+        convert = self.convert
+        result = {}
+
+        if self.fields is not None:
+            for name, source in self.fields:
+                if source in document:
+                    value = document[source]
+                    result[name] = convert[name](value) if name in convert else value
+        else:
+            exclude = self.exclude
+            for name, value in document.items():
+                if name not in exclude:
+                    result[name] = convert[name](value) if name in convert else value
+
+        if extra:
+            result.update(extra)
+
+        return result
+
+    def dump_many(self, documents):
+        """
+        Build the responses for a list of documents
+        """
+        return [self.dump(document) for document in documents]
+
+# The profile never includes the password hash, medicines or sync bookkeeping
+PROFILE = ResponseSchema(
+    exclude=('password', 'medicines', 'data_version', 'field_versions', 'tombstones'),
+    convert={'_id': str}
+)
+
+MEDICINE = ResponseSchema(convert={'_id': str})
+
+DOSE_EVENT = ResponseSchema(
+    exclude=('user_id', 'pending'),
+    convert={'_id': str, 'medicine_id': str}
+)
+
+SCHEDULE_ENTRY = ResponseSchema(
+    fields=(('id', '_id'), 'name', 'dosage', 'time'),
+    convert={'id': str}
+)
@@ -0,0 +1,117 @@
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from app.config import Config
+from app.models.revoked_token import RevokedToken
+
+# Revocations are re-read this many seconds back on each sync, so documents
+# written by a node whose clock is slightly behind are not missed
+SYNC_OVERLAP = 60
+
+class RevocationList:
+    """
+    In-process copy of the revoked_tokens collection
+
+    Checking a token is two dict lookups, the collection is only read when the
+    copy is older than REVOCATION_SYNC_INTERVAL seconds, and then only for the
+    revocations made since the previous sync. Revocations made by this process
+    apply here at once, those made by other workers and nodes within the sync
+    interval. Lookups take no lock, syncs run one at a time and requests that
+    arrive meanwhile use the current copy.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._users = {}
+        self._synced_at = None
+        self._next_sync = 0
+        self._prune_size = 1000
+        self._lock = Lock()
+
+    def is_revoked(self, payload):
+        """
+        Check whether the payload of a valid token was revoked
+        """
+        self._sync_if_due()
+
+        jti = payload.get('jti')
+        if jti is not None and jti in self._tokens:
+            return True
+
+        issued_before = self._users.get(payload.get('user_id'))
+        return issued_before is not None and payload.get('iat', 0) < issued_before
+
+    def revoke_token(self, payload):
+        """
+        Revoke a single token by the payload it decodes to
+
+        Tokens issued before jti was added can only be revoked with revoke_user.
+        """
+        jti = payload.get('jti')
+        if jti is None:
+            return False
+
+        RevokedToken.revoke_token(jti, payload.get('user_id'), datetime.utcfromtimestamp(payload['exp']))
+        self._tokens[jti] = payload['exp']
+        return True
+
+    def revoke_user(self, user_id):
+        """
+        Revoke every token issued to a user so far
+
+        Tokens carry iat with sub-second precision, so a login right after this
+        gets a valid token. Tokens with a whole-second iat issued during the
+        current second are revoked.
+        """
+        issued_before = time.time()
+        expires_at = datetime.utcnow() + timedelta(seconds=Config.JWT_REFRESH_TOKEN_EXPIRES + 1)
+
+        RevokedToken.revoke_user(user_id, issued_before, expires_at)
+        self._users[str(user_id)] = max(issued_before, self._users.get(str(user_id), 0))
+
+    def _sync_if_due(self):
+        if time.monotonic() < self._next_sync:
+            return
+
+        # Only the first load makes requests wait, later syncs are skipped by
+        # requests that find one already running
+        if not self._lock.acquire(blocking=self._synced_at is None):
+            return
+
+        try:
+            if time.monotonic() < self._next_sync:
+                return
+
+            started = datetime.utcnow()
+            since = self._synced_at - timedelta(seconds=SYNC_OVERLAP) if self._synced_at else None
+
+            for document in RevokedToken.find_since(since):
+                if 'issued_before' in document:
+                    user_id = document['user_id']
+                    self._users[user_id] = max(document['issued_before'], self._users.get(user_id, 0))
+                else:
+                    self._tokens[document['_id']] = document['expires_at'].replace(tzinfo=timezone.utc).timestamp()
+
+            self._synced_at = started
+            self._prune()
+        except Exception as e:
+            print(f"Error syncing revoked tokens: {e}")
+        finally:
+            self._next_sync = time.monotonic() + Config.REVOCATION_SYNC_INTERVAL
+            self._lock.release()
+
+    def _prune(self):
+        # Expired tokens fail verification anyway, drop them once the copy has
+        # doubled in size since the last prune
+        if len(self._tokens) + len(self._users) < self._prune_size:
+            return
+
+        now = time.time()
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+
+        oldest = now - Config.JWT_REFRESH_TOKEN_EXPIRES
+        self._users = {user_id: before for user_id, before in self._users.items() if before > oldest}
+
+        self._prune_size = max(1000, 2 * (len(self._tokens) + len(self._users)))
+
+revocations = RevocationList()
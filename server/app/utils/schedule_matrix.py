@@ -0,0 +1,142 @@
+import numpy as np
+from datetime import date
+from app.utils.response_schemas import SCHEDULE_ENTRY
+
+# np.datetime64 days count from 1970-01-01, which was a Thursday
+EPOCH_WEEKDAY = 3
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+PERIODS = ('month', 'quarter', 'year')
+
+class ScheduleMatrix:
+    """
+    Vectorized medicine calendar for a date range
+
+    scheduled and taken are boolean arrays of shape (days, medicines): row i is
+    days[i] and column j is medicines[j], a Medicine. taken is only ever set
+    where the medicine was also scheduled.
+    """
+
+    def __init__(self, medicines, start_date, end_date, completion_index):
+        # Columns are ordered by time so every day serializes already sorted
+        self.medicines = sorted(medicines, key=lambda medicine: medicine.minutes)
+        self.days = np.arange(
+            np.datetime64(start_date, 'D'),
+            np.datetime64(end_date, 'D') + np.timedelta64(1, 'D')
+        )
+        self.day_strings = np.datetime_as_string(self.days, unit='D')
+
+        shape = (len(self.days), len(self.medicines))
+        self.scheduled = np.zeros(shape, dtype=bool)
+        self.taken = np.zeros(shape, dtype=bool)
+
+        day_numbers = self.days.astype(np.int64)
+        weekdays = (day_numbers + EPOCH_WEEKDAY) % 7
+        month_days = (self.days - self.days.astype('datetime64[M]')).astype(np.int64) + 1
+        ordinals = day_numbers + EPOCH_ORDINAL
+
+        for column, medicine in enumerate(self.medicines):
+            recurrence = medicine.recurrence
+
+            if recurrence.daily:
+                self.scheduled[:, column] = True
+            else:
+                scheduled = ((recurrence.weekday_mask >> weekdays) & 1).astype(bool)
+                scheduled |= ((recurrence.month_day_mask >> month_days) & 1).astype(bool)
+                if recurrence.dates:
+                    scheduled |= np.isin(ordinals, np.fromiter(recurrence.dates, dtype=np.int64))
+                self.scheduled[:, column] = scheduled
+
+            taken_dates = completion_index.dates_for(medicine.id)
+            if taken_dates:
+                self.taken[:, column] = np.isin(self.day_strings, list(taken_dates))
+
+        self.taken &= self.scheduled
+
+    def to_schedule(self):
+        """
+        Serialize as {date: [{'id', 'name', 'dosage', 'time', 'completed'}]}
+        """
+        return dict(self.iter_days())
+
+    def iter_days(self):
+        """
+        Yield (date, [{'id', 'name', 'dosage', 'time', 'completed'}]) one day at a time
+        """
+        entries = [SCHEDULE_ENTRY.dump(medicine.document) for medicine in self.medicines]
+
+        for row, date_str in enumerate(self.day_strings.tolist()):
+            taken = self.taken[row]
+            yield date_str, [
+                dict(entries[column], completed=bool(taken[column]))
+                for column in np.flatnonzero(self.scheduled[row]).tolist()
+            ]
+
+    def period_keys(self, period):
+        """
+        Label every day with its month (YYYY-MM), quarter (YYYY-Qn) or year (YYYY)
+        """
+        if period == 'month':
+            return np.datetime_as_string(self.days.astype('datetime64[M]'), unit='M')
+
+        if period == 'year':
+            return np.datetime_as_string(self.days.astype('datetime64[Y]'), unit='Y')
+
+        if period == 'quarter':
+            months = self.days.astype('datetime64[M]').astype(np.int64)
+            years = months // 12 + 1970
+            quarters = months % 12 // 3 + 1
+            return np.char.add(np.char.add(years.astype(str), '-Q'), quarters.astype(str))
+
+        raise ValueError(f"Unknown period: {period}")
+
+    def adherence(self, period='month', today=None):
+        """
+        Summarize doses per period
+
+        Adherence is the percentage of due doses (scheduled up to and including
+        today) that were taken, or None when nothing was due.
+        """
+        today = np.datetime64(today or date.today(), 'D')
+        due_matrix = self.scheduled & (self.days <= today)[:, np.newaxis]
+
+        # Days are sorted, so every period is one contiguous block of rows
+        labels, first_rows = np.unique(self.period_keys(period), return_index=True)
+        last_rows = np.append(first_rows[1:], len(self.days)) - 1
+
+        def totals(matrix):
+            # (periods, medicines) counts of the True cells in each period
+            return np.add.reduceat(matrix.astype(np.int64), first_rows, axis=0)
+
+        scheduled = totals(self.scheduled)
+        due = totals(due_matrix)
+        taken = totals(self.taken)
+
+        summary = []
+        for index, label in enumerate(labels.tolist()):
+            medicines = []
+            for column, medicine in enumerate(self.medicines):
+                medicines.append({
+                    'id': medicine.id,
+                    'name': medicine.name,
+                    'scheduled': int(scheduled[index, column]),
+                    'due': int(due[index, column]),
+                    'taken': int(taken[index, column]),
+                    'adherence': _percentage(taken[index, column], due[index, column])
+                })
+
+            summary.append({
+                'period': label,
+                'start_date': str(self.day_strings[first_rows[index]]),
+                'end_date': str(self.day_strings[last_rows[index]]),
+                'scheduled': int(scheduled[index].sum()),
+                'due': int(due[index].sum()),
+                'taken': int(taken[index].sum()),
+                'adherence': _percentage(taken[index].sum(), due[index].sum()),
+                'medicines': medicines
+            })
+
+        return summary
+
+def _percentage(part, total):
+    return None if total == 0 else float(part) / float(total) * 100
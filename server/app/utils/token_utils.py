@@ -1,8 +1,20 @@
 import jwt
+import time
+import hashlib
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from functools import wraps
+from threading import Lock
 from flask import request, jsonify, current_app
 from app.config import Config
+from app.utils.revocation import revocations
+
+# Verified payloads by token digest, so a token presented again skips the
+# signature check until it expires
+_verified = OrderedDict()
+_verified_lock = Lock()
+_verified_stats = {'hits': 0, 'misses': 0}
 
 def generate_token(user_id, token_type='access'):
     """
@@ -18,8 +30,12 @@ def generate_token(user_id, token_type='access'):
     payload = {
         'user_id': str(user_id),
         'exp': expire_time,
-        'iat': datetime.utcnow(),
-        'type': token_type
+        # With sub-second precision, so a token issued right after revoke_user
+        # is not revoked with the ones before it
+        'iat': time.time(),
+        'type': token_type,
+        # Identifies the token for revocation
+        'jti': uuid.uuid4().hex
     }
     
     token = jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm='HS256')
@@ -29,15 +45,61 @@ def generate_token(user_id, token_type='access'):
 def decode_token(token):
     """
     Decode and validate a JWT token
-    Returns the payload if valid, None if invalid
+    Returns the payload if valid, None if invalid or revoked
+    
+    Valid tokens are remembered until their exp, see token_cache_stats.
+    The returned payload is shared and must not be modified.
     """
+    payload = _verify(token)
+    
+    # Checked on every call, so revoking a cached token takes effect too
+    if payload is None or revocations.is_revoked(payload):
+        return None
+    
+    return payload
+
+def _verify(token):
+    if isinstance(token, str):
+        token = token.encode('utf-8')
+    key = hashlib.sha256(token).digest()
+    
+    with _verified_lock:
+        entry = _verified.get(key)
+        if entry is not None and entry[0] > time.time():
+            _verified.move_to_end(key)
+            _verified_stats['hits'] += 1
+            return entry[1]
+        _verified_stats['misses'] += 1
+    
     try:
         payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    # Only tokens that expire are cached, and only until they do
+    if isinstance(payload.get('exp'), (int, float)):
+        with _verified_lock:
+            _verified[key] = (payload['exp'], payload)
+            _verified.move_to_end(key)
+            while len(_verified) > Config.JWT_CACHE_SIZE:
+                _verified.popitem(last=False)
+    
+    return payload
+
+def token_cache_stats():
+    """
+    Get the hit/miss counters and size of the verified token cache
+    """
+    with _verified_lock:
+        lookups = _verified_stats['hits'] + _verified_stats['misses']
+        return {
+            'hits': _verified_stats['hits'],
+            'misses': _verified_stats['misses'],
+            'size': len(_verified),
+            'hit_rate': _verified_stats['hits'] / lookups if lookups else None
+        }
 
 def token_required(f):
     """
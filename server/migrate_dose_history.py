@@ -0,0 +1,52 @@
+"""
+Dose History Migration Script
+
+Moves the dose history embedded in users.medicines[].history into the
+dose_events collection and removes it from the user documents, then removes
+duplicate "taken" events for the same medicine and day and builds the unique
+index that prevents them.
+
+Usage:
+    python migrate_dose_history.py            # migrate every user
+    python migrate_dose_history.py <user_id>  # migrate a single user
+"""
+
+import sys
+import logging
+from app import create_app
+from app.config import Config
+from app.database import get_db, create_dose_completion_index
+from app.models.dose_event import DoseEvent
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+
+    # Creating the app connects to MongoDB and makes sure the indexes exist,
+    # except the unique one that can only be built after the duplicates are gone
+    Config.DOSE_COMPLETION_INDEX_REQUIRED = False
+    create_app()
+
+    if user_id:
+        logger.info(f"Migrating dose history for user {user_id}")
+    else:
+        logger.info("Migrating dose history for all users")
+
+    users_migrated, events_inserted = DoseEvent.migrate_embedded_history(user_id)
+
+    logger.info(f"Migrated {users_migrated} user(s), inserted {events_inserted} dose event(s)")
+
+    removed = DoseEvent.remove_duplicate_completions()
+    logger.info(f"Removed {removed} duplicate completed dose event(s)")
+
+    create_dose_completion_index(get_db())
+    logger.info("Unique dose completion index is in place")
+
+if __name__ == "__main__":
+    main()
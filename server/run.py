@@ -1,7 +1,10 @@
 from app import create_app
 
-# Provide the config_name parameter
-app = create_app('development')
+# Processes started with spawn or forkserver, such as the bcrypt pool,
+# import this module again as __mp_main__ and need no app
+if __name__ != '__mp_main__':
+    # Provide the config_name parameter
+    app = create_app('development')
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0')
\ No newline at end of file
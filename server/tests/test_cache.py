@@ -0,0 +1,136 @@
+import os
+import stat
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.models.user import User
+from app.services.user_service import UserService
+from app.utils import cache as cache_module
+from app.utils.cache import CacheBackend, MemoryCache, SQLiteCache
+
+USER_ID = '6ad2c9afcbc05b0ea4966538'
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / 'private' / 'cache.sqlite3')
+
+def test_cache_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend(60)
+
+def test_sqlite_cache_stores_values_in_their_json_form(sqlite_path):
+    cache = SQLiteCache(sqlite_path)
+    value = {
+        '_id': ObjectId(USER_ID),
+        'created_at': datetime(2025, 5, 1, 8, 30),
+        'times': ['08:00', '20:00'],
+        'count': 3,
+        'ratio': 0.5,
+        'active': True,
+        'notes': None
+    }
+
+    cache.set(USER_ID, 'profile', value, cache.version(USER_ID))
+
+    assert cache.get(USER_ID, 'profile', cache.version(USER_ID)) == {
+        '_id': USER_ID,
+        'created_at': '2025-05-01T08:30:00',
+        'times': ['08:00', '20:00'],
+        'count': 3,
+        'ratio': 0.5,
+        'active': True,
+        'notes': None
+    }
+
+def test_sqlite_cache_file_is_private(sqlite_path):
+    SQLiteCache(sqlite_path)
+
+    assert stat.S_IMODE(os.stat(sqlite_path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(sqlite_path)).st_mode) == 0o700
+
+def test_sqlite_cache_refuses_files_of_other_users(sqlite_path, monkeypatch):
+    SQLiteCache(sqlite_path)
+    monkeypatch.setattr(os, 'getuid', lambda: os.stat(sqlite_path).st_uid + 1)
+
+    with pytest.raises(RuntimeError):
+        SQLiteCache(sqlite_path)
+
+def test_sqlite_cache_refuses_symlinks(sqlite_path, tmp_path):
+    os.makedirs(os.path.dirname(sqlite_path))
+    os.symlink(tmp_path / 'elsewhere.sqlite3', sqlite_path)
+
+    with pytest.raises(OSError):
+        SQLiteCache(sqlite_path)
+
+@pytest.mark.parametrize('make_cache', [
+    lambda path: MemoryCache(),
+    lambda path: SQLiteCache(path)
+])
+def test_invalidate_drops_values(make_cache, sqlite_path):
+    cache = make_cache(sqlite_path)
+    version = cache.version(USER_ID)
+    cache.set(USER_ID, 'view', {'a': 1}, version)
+
+    cache.invalidate(USER_ID)
+
+    assert cache.get(USER_ID, 'view', version) is None
+    assert cache.get(USER_ID, 'view', cache.version(USER_ID)) is None
+
+@pytest.fixture
+def data_version(monkeypatch):
+    data_version = {'value': 1}
+    monkeypatch.setattr(User, 'get_data_version', lambda user_id: data_version['value'])
+    monkeypatch.setattr(cache_module, 'cache', MemoryCache())
+    return data_version
+
+def cached_view(computed):
+    def compute():
+        computed.append(1)
+        return True, {'computed': len(computed)}, 200
+
+    return UserService._cached(USER_ID, 'schedule', ('2025-05-01', '2025-05-07'), compute)
+
+def test_cached_view_is_computed_once_per_data_version(data_version):
+    computed = []
+
+    assert cached_view(computed) == (True, {'computed': 1}, 200)
+    assert cached_view(computed) == (True, {'computed': 1}, 200)
+
+    # A write from another host only bumps the data_version
+    data_version['value'] = 2
+    assert cached_view(computed) == (True, {'computed': 2}, 200)
+    assert cached_view(computed) == (True, {'computed': 2}, 200)
+
+def test_cached_view_is_computed_again_after_invalidate(data_version):
+    computed = []
+    cached_view(computed)
+
+    cache_module.get_cache().invalidate(USER_ID)
+
+    assert cached_view(computed) == (True, {'computed': 2}, 200)
+
+def test_cached_view_keys_include_the_date_range(data_version):
+    computed = []
+    cached_view(computed)
+
+    def compute():
+        return True, {'other': True}, 200
+
+    assert UserService._cached(USER_ID, 'schedule', ('2025-05-08', '2025-05-14'), compute)[1] == {'other': True}
+
+def test_failed_views_are_not_cached(data_version):
+    results = [(False, "User not found", 404), (True, {'value': 1}, 200)]
+
+    assert UserService._cached(USER_ID, 'view', (), lambda: results.pop(0)) == (False, "User not found", 404)
+    assert UserService._cached(USER_ID, 'view', (), lambda: results.pop(0)) == (True, {'value': 1}, 200)
+
+def test_unknown_users_are_not_cached(data_version):
+    data_version['value'] = None
+    computed = []
+
+    cached_view(computed)
+    cached_view(computed)
+
+    assert len(computed) == 2
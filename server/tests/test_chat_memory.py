@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.config import Config
+from app.models.chat_message import ChatMessage
+from app.utils.chat_memory import ChatMemory, format_history
+
+ANN = '6ad2c9afcbc05b0ea4966538'
+BOB = '6ad2c9afcbc05b0ea4966539'
+
+class Collection:
+    """
+    chat_messages shared by every worker
+    """
+
+    def __init__(self):
+        self.documents = []
+
+    def add_exchange(self, user_id, prompt, response):
+        now = datetime.utcnow()
+        documents = [
+            {'_id': ObjectId(), 'user_id': user_id, 'role': 'human', 'text': prompt, 'created_at': now},
+            {'_id': ObjectId(), 'user_id': user_id, 'role': 'ai', 'text': response, 'created_at': now}
+        ]
+        self.documents.extend(documents)
+        return documents
+
+    def find_recent(self, user_id, since, limit):
+        documents = [
+            document for document in self.documents
+            if document['user_id'] == user_id and document['created_at'] >= since
+        ]
+        return documents[-limit:]
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = Collection()
+    monkeypatch.setattr(ChatMessage, 'add_exchange', collection.add_exchange)
+    monkeypatch.setattr(ChatMessage, 'find_recent', collection.find_recent)
+    return collection
+
+def test_sessions_are_per_user(collection):
+    memory = ChatMemory()
+    memory.history(ANN)
+    memory.history(BOB)
+
+    memory.add_exchange(ANN, "Ann's question", "Ann's answer")
+    memory.add_exchange(BOB, "Bob's question", "Bob's answer")
+
+    assert memory.history(ANN) == [('human', "Ann's question"), ('ai', "Ann's answer")]
+    assert memory.history(BOB) == [('human', "Bob's question"), ('ai', "Bob's answer")]
+
+def test_new_sessions_only_load_their_own_user(collection):
+    ChatMemory().add_exchange(ANN, "Ann's question", "Ann's answer")
+
+    assert ChatMemory().history(BOB) == []
+    assert ChatMemory().history(ANN) == [('human', "Ann's question"), ('ai', "Ann's answer")]
+
+def test_exchanges_of_other_workers_are_merged_once(collection):
+    first, second = ChatMemory(), ChatMemory()
+    first.history(ANN)
+    second.history(ANN)
+
+    first.add_exchange(ANN, "first", "first answer")
+    second.history(ANN)
+    second.add_exchange(ANN, "second", "second answer")
+
+    expected = [('human', "first"), ('ai', "first answer"), ('human', "second"), ('ai', "second answer")]
+    assert first.history(ANN) == expected
+    assert second.history(ANN) == expected
+
+def test_old_messages_are_not_loaded(collection):
+    collection.add_exchange(ANN, "stale", "stale answer")
+    for document in collection.documents:
+        document['created_at'] -= timedelta(seconds=Config.CHAT_MEMORY_IDLE_TTL + 1)
+
+    assert ChatMemory().history(ANN) == []
+
+def test_history_is_kept_within_the_token_budget(collection, monkeypatch):
+    # Each prompt is 11 tokens and each response 3
+    monkeypatch.setattr(Config, 'CHAT_MEMORY_TOKEN_BUDGET', 31)
+    memory = ChatMemory()
+    memory.history(ANN)
+
+    for number in range(3):
+        memory.add_exchange(ANN, f"question {number} " + 'x' * 30, f"answer {number}")
+
+    # The first response fits too, but history never starts with a response
+    assert [text[:10] for role, text in memory.history(ANN)] == ["question 1", "answer 1", "question 2", "answer 2"]
+
+def test_history_is_kept_within_the_message_limit(collection, monkeypatch):
+    monkeypatch.setattr(Config, 'CHAT_MEMORY_MAX_MESSAGES', 4)
+    memory = ChatMemory()
+    memory.history(ANN)
+
+    for number in range(3):
+        memory.add_exchange(ANN, f"question {number}", f"answer {number}")
+
+    assert [text for role, text in memory.history(ANN)] == ["question 1", "answer 1", "question 2", "answer 2"]
+
+def test_sessions_survive_a_failing_collection(collection, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("connection lost")
+
+    memory = ChatMemory()
+    memory.history(ANN)
+    monkeypatch.setattr(ChatMessage, 'add_exchange', fail)
+    monkeypatch.setattr(ChatMessage, 'find_recent', fail)
+
+    memory.add_exchange(ANN, "question", "answer")
+
+    assert memory.history(ANN) == [('human', "question"), ('ai', "answer")]
+    assert memory.history(BOB) == []
+
+def test_least_recently_used_sessions_are_evicted(collection, monkeypatch):
+    monkeypatch.setattr(Config, 'CHAT_MEMORY_MAX_SESSIONS', 1)
+    memory = ChatMemory()
+
+    memory.history(ANN)
+    memory.history(BOB)
+
+    assert list(memory._sessions) == [BOB]
+
+def test_format_history():
+    assert format_history([('human', "Hi"), ('ai', "Hello")]) == "Human: Hi\nAI: Hello"
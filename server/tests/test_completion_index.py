@@ -0,0 +1,41 @@
+from bson import ObjectId
+
+from app.utils.completion_index import CompletionIndex
+from app.utils.medicine import Medicine
+
+MEDICINE_ID = ObjectId('6ad2c9afcbc05b0ea4966539')
+
+def test_events_and_embedded_history_are_combined():
+    medicines = Medicine.from_documents([{
+        '_id': MEDICINE_ID,
+        'history': [
+            {'date': '2025-04-30', 'completed': True},
+            {'date': '2025-05-01', 'completed': True},
+            {'date': '2025-05-02', 'completed': False},
+            {'date': '2025-05-08', 'completed': True},
+            {'completed': True}
+        ]
+    }])
+    events = [
+        {'medicine_id': str(MEDICINE_ID), 'date': '2025-05-03', 'completed': True},
+        {'medicine_id': str(MEDICINE_ID), 'date': '2025-05-04', 'completed': False},
+        {'medicine_id': str(MEDICINE_ID), 'date': '2025-05-05'}
+    ]
+
+    index = CompletionIndex.from_events(events, medicines, '2025-05-01', '2025-05-07')
+
+    assert index.dates_for(MEDICINE_ID) == {'2025-05-01', '2025-05-03'}
+
+def test_ids_are_matched_as_strings():
+    index = CompletionIndex()
+    index.add(MEDICINE_ID, '2025-05-01')
+
+    assert index.is_completed(str(MEDICINE_ID), '2025-05-01')
+    assert index.is_completed(MEDICINE_ID, '2025-05-01')
+    assert not index.is_completed(MEDICINE_ID, '2025-05-02')
+
+def test_unknown_medicines_have_no_dates():
+    index = CompletionIndex()
+
+    assert not index.is_completed(MEDICINE_ID, '2025-05-01')
+    assert index.dates_for(MEDICINE_ID) == set()
@@ -0,0 +1,69 @@
+import pytest
+from flask import Flask, jsonify
+
+from app.models.user import User
+from app.services.user_service import UserService
+from app.utils import cache as cache_module
+from app.utils.cache import MemoryCache
+from app.utils.etag_utils import conditional_get
+
+USER_ID = '6ad2c9afcbc05b0ea4966538'
+
+@pytest.fixture
+def version_reads(monkeypatch):
+    reads = []
+
+    def get_data_version(user_id):
+        reads.append(user_id)
+        return 7
+
+    monkeypatch.setattr(User, 'get_data_version', get_data_version)
+    monkeypatch.setattr(cache_module, 'cache', MemoryCache())
+    return reads
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    computed = []
+
+    @app.route('/view/<user_id>')
+    @conditional_get
+    def view(user_id):
+        def compute():
+            computed.append(user_id)
+            return True, {'value': 1}, 200
+
+        success, result, status_code = UserService._cached(user_id, 'view', (), compute)
+        return jsonify(result), status_code
+
+    client = app.test_client()
+    client.computed = computed
+    return client
+
+def test_cached_get_reads_the_data_version_once(client, version_reads):
+    response = client.get(f'/view/{USER_ID}')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'value': 1}
+    assert version_reads == [USER_ID]
+
+def test_cache_hit_only_reads_the_data_version(client, version_reads):
+    client.get(f'/view/{USER_ID}')
+    response = client.get(f'/view/{USER_ID}')
+
+    assert response.get_json() == {'value': 1}
+    assert client.computed == [USER_ID]
+    assert version_reads == [USER_ID, USER_ID]
+
+def test_not_modified_skips_the_view(client, version_reads):
+    etag = client.get(f'/view/{USER_ID}').headers['ETag']
+    response = client.get(f'/view/{USER_ID}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert version_reads == [USER_ID, USER_ID]
+
+def test_cached_outside_a_request_reads_the_data_version(version_reads):
+    success, data, status_code = UserService._cached(USER_ID, 'view', (), lambda: (True, {'value': 2}, 200))
+
+    assert data == {'value': 2}
+    assert version_reads == [USER_ID]
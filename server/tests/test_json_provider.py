@@ -0,0 +1,116 @@
+import json
+import math
+import random
+import struct
+from datetime import datetime, date, timezone, timedelta
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+
+from app.utils.json_utils import MongoJSONProvider
+
+orjson = pytest.importorskip('orjson')
+
+def make_provider(use_orjson):
+    app = Flask(__name__)
+    app.config['JSON_USE_ORJSON'] = use_orjson
+    return MongoJSONProvider(app)
+
+@pytest.fixture(scope='module')
+def providers():
+    return make_provider(True), make_provider(False)
+
+def assert_same_value(providers, obj):
+    # orjson output is compact, only the decoded values have to agree
+    fast, stdlib = providers
+    assert fast.use_orjson and not stdlib.use_orjson
+    assert json.loads(fast.dumps_bytes(obj)) == json.loads(stdlib.dumps_bytes(obj))
+
+@pytest.mark.parametrize('value', [
+    ObjectId('6ad2c9afcbc05b0ea4966538'),
+    datetime(2025, 5, 1, 8, 30),
+    datetime(2025, 5, 1, 8, 30, 15, 123456),
+    datetime(2025, 5, 1, 8, 30, tzinfo=timezone.utc),
+    datetime(2025, 5, 1, 8, 30, 15, 500, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+    date(2025, 5, 1),
+    1e16,
+    -1.5e16,
+    1e22,
+    1.7976931348623157e308,
+    5e-324,
+    1e-5,
+    -4.23063685434335e-05,
+    1.5e-6,
+    0.0001,
+    0.1,
+    -0.0,
+    2 ** 63 - 1,
+    -2 ** 63,
+    2 ** 64 - 1,
+    2 ** 64,
+    -2 ** 63 - 1,
+    10 ** 30,
+    'plain text',
+    'unicode é中   \U0001F600',
+    'control \x00\x1f "quoted" back\\slash 1e+16 NaN',
+    None,
+    True,
+])
+def test_values_decode_identically(providers, value):
+    assert_same_value(providers, value)
+    assert_same_value(providers, {'value': value, 'list': [value, 1]})
+
+def test_stdlib_path_is_plain_json_dumps(providers):
+    fast, stdlib = providers
+    document = {'_id': ObjectId('6ad2c9afcbc05b0ea4966538'), 'at': datetime(2025, 5, 1, 8, 30), 'name': 'café', 'floats': [1e16, 1e-5]}
+
+    assert stdlib.dumps_bytes(document) == (
+        b'{"_id": "6ad2c9afcbc05b0ea4966538", "at": "2025-05-01T08:30:00", '
+        b'"name": "caf\\u00e9", "floats": [1e+16, 1e-05]}'
+    )
+    assert stdlib.dumps(document, separators=(',', ':')).startswith('{"_id":"6ad2c9afcbc05b0ea4966538",')
+
+@pytest.mark.parametrize('value, stdlib_bytes', [
+    (float('nan'), b'NaN'),
+    (float('inf'), b'Infinity'),
+    (float('-inf'), b'-Infinity')
+])
+def test_non_finite_floats(providers, value, stdlib_bytes):
+    # The stdlib path keeps writing what it always has, orjson writes null
+    fast, stdlib = providers
+    assert stdlib.dumps_bytes(value) == stdlib_bytes
+    assert fast.dumps_bytes(value) == b'null'
+
+def test_document_with_big_int_falls_back_to_stdlib(providers):
+    document = {
+        '_id': ObjectId('6ad2c9afcbc05b0ea4966538'),
+        'created_at': datetime(2025, 5, 1, 8, 30),
+        'big': 2 ** 70,
+        'floats': [1e16, 1e-5, 0.5]
+    }
+
+    fast, stdlib = providers
+    assert fast.dumps_bytes(document) == stdlib.dumps_bytes(document)
+
+def test_random_floats_decode_identically(providers):
+    rng = random.Random(1234)
+    values = []
+
+    while len(values) < 20000:
+        value = struct.unpack('d', struct.pack('Q', rng.getrandbits(64)))[0]
+        if math.isfinite(value):
+            values.append(value)
+
+    # Also cover every power of ten around the notation thresholds
+    values += [sign * digits * 10.0 ** exponent for sign in (1, -1) for digits in (1, 1.25) for exponent in range(-12, 25)]
+
+    assert_same_value(providers, values)
+
+def test_nested_document(providers):
+    document = {
+        'user': {'_id': ObjectId(), 'tags': ('a', 'b'), 'score': 12.75},
+        'events': [{'date': date(2025, 1, 2), 'at': datetime(2025, 1, 2, 3, 4, 5)}]
+    }
+
+    assert_same_value(providers, document)
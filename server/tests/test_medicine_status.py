@@ -0,0 +1,69 @@
+import pytest
+
+from app.models.dose_event import DoseEvent
+from app.models.user import User
+
+USER_ID = '6ad2c9afcbc05b0ea4966538'
+MEDICINE_ID = '6ad2c9afcbc05b0ea4966539'
+EVENT_ID = '6ad2c9afcbc05b0ea496653a'
+
+@pytest.fixture
+def events(monkeypatch):
+    events = {'written': [], 'deleted': [], 'versioned': []}
+
+    def mark_taken(user_id, medicine_id, date, time):
+        events['written'].append(EVENT_ID)
+        return EVENT_ID
+
+    monkeypatch.setattr(DoseEvent, 'mark_taken', mark_taken)
+    monkeypatch.setattr(DoseEvent, 'create', lambda *args: mark_taken(*args[:2], *args[3:]))
+    monkeypatch.setattr(DoseEvent, 'delete', lambda event_id: events['deleted'].append(event_id))
+    monkeypatch.setattr(DoseEvent, 'delete_many', lambda event_ids: events['deleted'].extend(event_ids))
+    monkeypatch.setattr(DoseEvent, 'set_version', lambda event_id, version: events['versioned'].append(event_id))
+    monkeypatch.setattr(DoseEvent, 'set_versions', lambda event_ids, version: events['versioned'].extend(event_ids))
+    monkeypatch.setattr(User, 'has_medicine', lambda user_id, medicine_id: True)
+    return events
+
+@pytest.mark.parametrize('completed', [True, False])
+def test_missing_medicine_writes_no_event(events, monkeypatch, completed):
+    monkeypatch.setattr(User, 'has_medicine', lambda user_id, medicine_id: False)
+
+    assert User.update_medicine_status(USER_ID, MEDICINE_ID, completed) == (False, False)
+    assert events['written'] == []
+
+def test_recorded_event_is_versioned(events, monkeypatch):
+    monkeypatch.setattr(User, '_versioned_update', lambda *args: 5)
+
+    assert User.update_medicine_status(USER_ID, MEDICINE_ID, True) == (True, True)
+    assert events['versioned'] == [EVENT_ID]
+    assert events['deleted'] == []
+
+def test_failed_version_update_removes_the_event(events, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(User, '_versioned_update', fail)
+
+    assert User.update_medicine_status(USER_ID, MEDICINE_ID, True) is None
+    assert events['deleted'] == [EVENT_ID]
+    assert events['versioned'] == []
+
+def test_medicine_deleted_meanwhile_removes_the_event(events, monkeypatch):
+    monkeypatch.setattr(User, '_versioned_update', lambda *args: None)
+
+    assert User.update_medicine_status(USER_ID, MEDICINE_ID, True) == (False, False)
+    assert events['deleted'] == [EVENT_ID]
+
+def test_failed_batch_version_update_removes_the_events(events, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(User, 'get_by_id', lambda user_id, projection: {'medicines': [{'_id': MEDICINE_ID}]})
+    monkeypatch.setattr(DoseEvent, 'record_many', lambda user_id, doses: [EVENT_ID])
+    monkeypatch.setattr(User, '_versioned_update', fail)
+
+    dose = {'medicine_id': MEDICINE_ID, 'completed': True, 'date': '2025-05-01', 'time': '08:00'}
+    with pytest.raises(RuntimeError):
+        User.record_doses(USER_ID, [dose])
+
+    assert events['deleted'] == [EVENT_ID]
@@ -0,0 +1,68 @@
+import pytest
+
+from app.models.user import User
+from app.services import user_service
+from app.services.user_service import UserService
+from app.utils.request_schemas import NewMedicine, decode
+
+USER_ID = '6ad2c9afcbc05b0ea4966538'
+MEDICINE_ID = '6ad2c9afcbc05b0ea4966539'
+
+@pytest.fixture
+def stored(monkeypatch):
+    stored = {'_id': MEDICINE_ID, 'name': 'Vitamin D', 'dosage': '1 pill', 'time': '20:00', 'frequency': 'daily'}
+    updates = []
+
+    def update_medicine(user_id, medicine_id, update_data):
+        updates.append(update_data)
+        stored.update(update_data)
+        return True
+
+    monkeypatch.setattr(User, 'get_medicine', lambda user_id, medicine_id: dict(stored))
+    monkeypatch.setattr(User, 'update_medicine', update_medicine)
+    monkeypatch.setattr(user_service, 'cache_recurrence', lambda medicine: None)
+    stored['updates'] = updates
+    return stored
+
+def test_frequency_only_update_uses_the_stored_days(stored):
+    stored['days'] = ['monday', 'friday']
+
+    success, data, status_code = UserService.update_medicine(USER_ID, MEDICINE_ID, {'frequency': 'weekly'})
+
+    assert status_code == 200
+    assert stored['updates'] == [{'frequency': 'weekly'}]
+
+def test_frequency_only_update_uses_the_stored_days_of_month(stored):
+    stored['days_of_month'] = [1, 15]
+
+    success, data, status_code = UserService.update_medicine(USER_ID, MEDICINE_ID, {'frequency': 'monthly'})
+
+    assert status_code == 200
+
+def test_frequency_update_without_days_is_rejected(stored):
+    success, message, status_code = UserService.update_medicine(USER_ID, MEDICINE_ID, {'frequency': 'weekly'})
+
+    assert status_code == 400
+    assert message == "days is required for weekly frequency"
+    assert stored['updates'] == []
+
+def test_frequency_update_with_days(stored):
+    success, data, status_code = UserService.update_medicine(
+        USER_ID, MEDICINE_ID, {'frequency': 'weekly', 'days': ['Friday', 'monday']}
+    )
+
+    assert status_code == 200
+    assert stored['updates'] == [{'frequency': 'weekly', 'days': ['monday', 'friday']}]
+
+def test_update_of_missing_medicine(stored, monkeypatch):
+    monkeypatch.setattr(User, 'get_medicine', lambda user_id, medicine_id: None)
+
+    success, message, status_code = UserService.update_medicine(USER_ID, MEDICINE_ID, {'frequency': 'weekly'})
+
+    assert status_code == 404
+
+def test_new_medicine_requires_its_days():
+    medicine = {'name': 'Vitamin D', 'dosage': '1 pill', 'time': '20:00', 'frequency': 'specific_dates'}
+
+    assert decode(medicine, NewMedicine) == (None, "dates is required for specific_dates frequency")
+    assert decode(dict(medicine, dates=['2025-05-02', '2025-05-01']), NewMedicine)[0]['dates'] == ['2025-05-01', '2025-05-02']
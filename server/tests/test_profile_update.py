@@ -0,0 +1,58 @@
+import pytest
+
+from app.models.user import User
+from app.services import user_service
+from app.services.user_service import UserService
+
+USER_ID = '6ad2c9afcbc05b0ea4966538'
+
+@pytest.fixture
+def no_writes(monkeypatch):
+    # Rejected updates must not reach the database
+    def fail(*args, **kwargs):
+        raise AssertionError("update reached the database")
+
+    monkeypatch.setattr(user_service, 'get_db', fail)
+    monkeypatch.setattr(User, 'get_by_id', fail)
+    monkeypatch.setattr(User, '_versioned_update', fail)
+
+@pytest.mark.parametrize('key', [
+    'medicines.name',
+    'medicines.0.name',
+    'tombstones.0',
+    'field_versions.email',
+    'data_version.x',
+    'password.hash',
+    'health_profile.allergies',
+    '$set',
+])
+def test_update_user_profile_rejects_paths_and_operators(no_writes, key):
+    success, message, status = UserService.update_user_profile(USER_ID, {'first_name': 'Ann', key: 'x'})
+
+    assert not success
+    assert status == 400
+    assert key in message
+
+def test_update_user_profile_still_drops_internal_fields(monkeypatch):
+    written = {}
+
+    def update_profile(user_id, profile_data):
+        written.update(profile_data)
+        return False
+
+    monkeypatch.setattr(User, 'update_profile', update_profile)
+
+    success, message, status = UserService.update_user_profile(USER_ID, {
+        '_id': USER_ID,
+        'password': 'secret',
+        'data_version': 99,
+        'first_name': 'Ann'
+    })
+
+    assert status == 304
+    assert written == {'first_name': 'Ann'}
+
+@pytest.mark.parametrize('update', [User.update, User.update_profile])
+def test_model_updates_refuse_paths(no_writes, update):
+    with pytest.raises(ValueError):
+        update(USER_ID, {'medicines.name': 'x'})
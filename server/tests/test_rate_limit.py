@@ -0,0 +1,127 @@
+import pytest
+from flask import Flask
+
+from app.utils import rate_limit
+from app.utils.rate_limit import MemoryRateLimitStore, RateLimiter, parse_limits
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(6000.0)
+    monkeypatch.setattr(rate_limit.time, 'time', clock.time)
+    return clock
+
+@pytest.fixture
+def limiter(clock):
+    limiter = RateLimiter()
+    limiter.store = MemoryRateLimitStore()
+    return limiter
+
+def test_parse_limits():
+    assert parse_limits('200 per day; 50 per hour') == [(200, 86400), (50, 3600)]
+    assert parse_limits('10 per minutes;') == [(10, 60)]
+    assert parse_limits('') == []
+
+@pytest.mark.parametrize('value', ['10 a minute', '10 per fortnight', 'ten per minute', '10 per'])
+def test_invalid_limits(value):
+    with pytest.raises(ValueError):
+        parse_limits(value)
+
+def test_limit_within_a_window(limiter, clock):
+    assert [limiter.hit('key', 3, 60) for _ in range(3)] == [0, 0, 0]
+
+    clock.now += 15
+    assert limiter.hit('key', 3, 60) == 45
+
+def test_previous_window_is_weighted_by_its_overlap(limiter, clock):
+    for _ in range(4):
+        limiter.hit('key', 4, 60)
+
+    # A quarter into the next window 3/4 of the previous 4 requests still count
+    clock.now += 75
+    assert limiter.hit('key', 4, 60) == 0
+
+    # Halfway only 2 of them do
+    clock.now += 15
+    assert limiter.hit('key', 4, 60) == 0
+    assert limiter.hit('key', 4, 60) == 30
+
+def test_rejected_requests_are_counted(limiter, clock):
+    limiter.hit('key', 1, 60)
+    limiter.hit('key', 1, 60)
+
+    # Both requests of the previous window still weigh 2 * 0.5
+    clock.now += 90
+    assert limiter.hit('key', 1, 60) == 30
+
+def test_window_boundary_does_not_reset_the_limit(limiter, clock):
+    clock.now += 59
+    for _ in range(10):
+        limiter.hit('key', 10, 60)
+
+    # A fixed window would allow another 10 requests a second later
+    clock.now += 1
+    assert limiter.hit('key', 10, 60) == 60
+
+def test_limits_recover_after_two_windows(limiter, clock):
+    for _ in range(5):
+        limiter.hit('key', 2, 60)
+
+    clock.now += 120
+    assert limiter.hit('key', 2, 60) == 0
+
+def test_keys_and_windows_are_counted_separately(limiter):
+    limiter.hit('first', 1, 60)
+
+    assert limiter.hit('second', 1, 60) == 0
+    assert limiter.hit('first', 1, 3600) == 0
+    assert limiter.hit('first', 1, 60) > 0
+
+def test_pruning_keeps_current_and_previous_buckets(clock, monkeypatch):
+    store = MemoryRateLimitStore()
+    hour = int(clock.now // 3600)
+    minute = int(clock.now // 60)
+    store._counts = {
+        ('key', 3600, hour - 1): 5,
+        ('key', 60, minute - 1): 6,
+        ('key', 60, minute - 2): 7
+    }
+    store._counts.update((('filler', 1, bucket), 1) for bucket in range(100000))
+
+    store.hit('key', minute, 60)
+
+    assert store.count('key', hour - 1, 3600) == 5
+    assert store.count('key', minute - 1, 60) == 6
+    assert store.count('key', minute - 2, 60) == 0
+    assert store.count('key', minute, 60) == 1
+
+def test_requests_over_the_limit_get_429(clock):
+    app = Flask(__name__)
+    app.config.update(RATELIMIT_DEFAULT='2 per minute', RATELIMIT_POLICIES={})
+    limiter = RateLimiter()
+
+    @app.route('/limited')
+    @limiter.limit('1 per minute')
+    def limited():
+        return 'ok'
+
+    @app.route('/open')
+    def open_view():
+        return 'ok'
+
+    limiter.init_app(app)
+    client = app.test_client()
+
+    assert client.get('/limited').status_code == 200
+    response = client.get('/limited')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '60'
+
+    # Routes without their own limits share the default
+    assert [client.get('/open').status_code for _ in range(3)] == [200, 200, 429]
@@ -0,0 +1,93 @@
+from datetime import date, datetime
+
+import pytest
+from bson import ObjectId
+
+from app.utils import recurrence
+from app.utils.recurrence import Recurrence, cache_recurrence, get_recurrence
+
+def scheduled_days(medicine, start, end):
+    compiled = Recurrence.compile(medicine)
+    return [
+        date.fromordinal(ordinal).isoformat()
+        for ordinal in range(start.toordinal(), end.toordinal() + 1)
+        if compiled.occurs_on(date.fromordinal(ordinal))
+    ]
+
+def test_daily_and_missing_frequency():
+    assert Recurrence.compile({'frequency': 'daily'}).occurs_on(date(2024, 2, 29))
+    assert Recurrence.compile({}).occurs_on(date(2024, 2, 29))
+
+def test_weekly_days_ignore_case_and_unknown_names():
+    medicine = {'frequency': 'weekly', 'days': ['Monday', 'SUNDAY', 'someday', None]}
+
+    assert scheduled_days(medicine, date(2024, 3, 1), date(2024, 3, 11)) == [
+        '2024-03-03', '2024-03-04', '2024-03-10', '2024-03-11'
+    ]
+
+def test_weekly_without_days_never_occurs():
+    assert scheduled_days({'frequency': 'weekly'}, date(2024, 3, 1), date(2024, 3, 31)) == []
+
+def test_monthly_day_31_skips_short_months():
+    medicine = {'frequency': 'monthly', 'days_of_month': [31]}
+
+    assert scheduled_days(medicine, date(2024, 1, 1), date(2024, 6, 30)) == [
+        '2024-01-31', '2024-03-31', '2024-05-31'
+    ]
+
+def test_monthly_february_29_only_in_leap_years():
+    medicine = {'frequency': 'monthly', 'days_of_month': [29, 30]}
+
+    assert scheduled_days(medicine, date(2023, 2, 1), date(2023, 3, 1)) == []
+    assert scheduled_days(medicine, date(2024, 2, 1), date(2024, 3, 1)) == ['2024-02-29']
+
+def test_monthly_ignores_invalid_days():
+    medicine = {'frequency': 'monthly', 'days_of_month': [0, 32, '15', 1]}
+
+    assert scheduled_days(medicine, date(2024, 4, 1), date(2024, 4, 30)) == ['2024-04-01']
+
+def test_specific_dates_need_zero_padding():
+    medicine = {'frequency': 'specific_dates', 'dates': ['2024-02-29', '2024-3-1', 'tomorrow', None]}
+
+    assert scheduled_days(medicine, date(2024, 2, 28), date(2024, 3, 2)) == ['2024-02-29']
+
+def test_occurs_on_accepts_datetimes():
+    compiled = Recurrence.compile({'frequency': 'specific_dates', 'dates': ['2024-02-29']})
+
+    assert compiled.occurs_on(datetime(2024, 2, 29, 23, 59))
+
+def test_unknown_frequency_never_occurs():
+    assert scheduled_days({'frequency': 'hourly'}, date(2024, 1, 1), date(2024, 1, 31)) == []
+
+def test_edited_medicine_gets_a_new_recurrence(monkeypatch):
+    monkeypatch.setattr(recurrence, '_cache', type(recurrence._cache)())
+    medicine = {
+        '_id': ObjectId(), 'frequency': 'weekly', 'days': ['monday'],
+        'updated_at': datetime(2024, 3, 1, 8, 0, 0, 123456)
+    }
+
+    first = get_recurrence(medicine)
+    # Read back from MongoDB with millisecond precision
+    assert get_recurrence(dict(medicine, updated_at=datetime(2024, 3, 1, 8, 0, 0, 123000))) is first
+
+    edited = dict(medicine, days=['tuesday'], updated_at=datetime(2024, 3, 1, 9, 0))
+    assert cache_recurrence(edited) is get_recurrence(edited)
+    assert get_recurrence(edited).occurs_on(date(2024, 3, 5))
+    assert not get_recurrence(edited).occurs_on(date(2024, 3, 4))
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(recurrence, '_cache', type(recurrence._cache)())
+    monkeypatch.setattr(recurrence, 'CACHE_SIZE', 2)
+    medicines = [{'_id': ObjectId(), 'frequency': 'daily'} for _ in range(3)]
+
+    for medicine in medicines:
+        get_recurrence(medicine)
+
+    assert list(recurrence._cache) == [(str(medicine['_id']), None) for medicine in medicines[1:]]
+
+@pytest.mark.parametrize('medicine', [{'frequency': 'daily'}, {'_id': None, 'frequency': 'daily'}])
+def test_medicines_without_id_are_not_cached(monkeypatch, medicine):
+    monkeypatch.setattr(recurrence, '_cache', type(recurrence._cache)())
+
+    assert get_recurrence(medicine).daily
+    assert len(recurrence._cache) == 0
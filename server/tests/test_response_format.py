@@ -0,0 +1,217 @@
+"""
+Response bytes of the GET endpoints, pinned to what the stdlib provider wrote
+before orjson support was added. Clients may compare or cache raw bodies, so
+the default encoding must not change.
+"""
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+
+from app.models.user import User
+from app.routes.user_routes import user_bp
+from app.services.user_service import UserService
+from app.utils import token_utils
+from app.utils.json_utils import MongoJSONProvider
+
+USER_ID = '6ad2c9afcbc05b0ea4966538'
+ASPIRIN_ID = ObjectId('6ad2cd306cc579c002466789')
+VITAMIN_ID = ObjectId('6ad2cd306cc579c00246678a')
+
+ASPIRIN = {
+    'name': 'Aspirin',
+    'dosage': '10mg',
+    'time': '08:00',
+    'frequency': 'daily',
+    'notes': 'Take with food, café',
+    '_id': ASPIRIN_ID,
+    'created_at': datetime(2025, 5, 1, 8, 30, 15, 123000),
+    'updated_at': datetime(2025, 5, 1, 8, 30, 15, 123000),
+    'last_status': True,
+    'last_taken': datetime(2025, 5, 2, 8, 5),
+    'version': 2,
+    'history': [{'date': '2025-05-02', 'time': '08:05', 'completed': True}]
+}
+
+VITAMIN = {
+    'name': 'Vitamin D',
+    'dosage': '1 pill',
+    'time': '20:00',
+    'frequency': 'weekly',
+    'days': ['monday', 'friday'],
+    '_id': VITAMIN_ID,
+    'created_at': datetime(2025, 5, 1, 9, 0),
+    'updated_at': datetime(2025, 5, 1, 9, 0),
+    'version': 3,
+    'history': []
+}
+
+PROGRESS = {'total': 3, 'completed': 2, 'pending': 1, 'progress': 66.66666666666667}
+
+SCHEDULE = {
+    '2025-05-02': [
+        {'id': str(ASPIRIN_ID), 'name': 'Aspirin', 'dosage': '10mg', 'time': '08:00', 'completed': True},
+        {'id': str(VITAMIN_ID), 'name': 'Vitamin D', 'dosage': '1 pill', 'time': '20:00', 'completed': False}
+    ],
+    '2025-05-03': [
+        {'id': str(ASPIRIN_ID), 'name': 'Aspirin', 'dosage': '10mg', 'time': '08:00', 'completed': False}
+    ]
+}
+
+ASPIRIN_JSON = (
+    '{"name": "Aspirin", "dosage": "10mg", "time": "08:00", "frequency": "daily", '
+    '"notes": "Take with food, caf\\u00e9", "_id": "6ad2cd306cc579c002466789", '
+    '"created_at": "2025-05-01T08:30:15.123000", "updated_at": "2025-05-01T08:30:15.123000", '
+    '"last_status": true, "last_taken": "2025-05-02T08:05:00", "version": 2, '
+    '"history": [{"date": "2025-05-02", "time": "08:05", "completed": true}]}'
+)
+
+VITAMIN_JSON = (
+    '{"name": "Vitamin D", "dosage": "1 pill", "time": "20:00", "frequency": "weekly", '
+    '"days": ["monday", "friday"], "_id": "6ad2cd306cc579c00246678a", '
+    '"created_at": "2025-05-01T09:00:00", "updated_at": "2025-05-01T09:00:00", "version": 3, "history": []}'
+)
+
+PROGRESS_JSON = '{"total": 3, "completed": 2, "pending": 1, "progress": 66.66666666666667}'
+
+SCHEDULE_JSON = (
+    '{"2025-05-02": [{"id": "6ad2cd306cc579c002466789", "name": "Aspirin", "dosage": "10mg", "time": "08:00", "completed": true}, '
+    '{"id": "6ad2cd306cc579c00246678a", "name": "Vitamin D", "dosage": "1 pill", "time": "20:00", "completed": false}], '
+    '"2025-05-03": [{"id": "6ad2cd306cc579c002466789", "name": "Aspirin", "dosage": "10mg", "time": "08:00", "completed": false}]}'
+)
+
+# (service method, path, service result, pinned response body)
+ENDPOINTS = [
+    (
+        'get_user_profile',
+        '/api/user/profile',
+        {
+            'email': 'ann@example.com',
+            'username': 'ann',
+            'first_name': 'Ann',
+            'last_name': 'Müller',
+            'created_at': datetime(2025, 4, 30, 12, 0),
+            'onboarding_complete': True,
+            'onboarding_step': 3,
+            'health_profile': {'health_conditions': [], 'allergies': ['penicillin'], 'height': 172.5, 'weight': 64},
+            '_id': USER_ID
+        },
+        '{"email": "ann@example.com", "username": "ann", "first_name": "Ann", "last_name": "M\\u00fcller", '
+        '"created_at": "2025-04-30T12:00:00", "onboarding_complete": true, "onboarding_step": 3, '
+        '"health_profile": {"health_conditions": [], "allergies": ["penicillin"], "height": 172.5, "weight": 64}, '
+        '"_id": "6ad2c9afcbc05b0ea4966538"}'
+    ),
+    (
+        'get_user_medicines',
+        '/api/user/medicines',
+        {'medicines': [ASPIRIN, VITAMIN]},
+        '{"medicines": [' + ASPIRIN_JSON + ', ' + VITAMIN_JSON + ']}'
+    ),
+    (
+        'get_today_medicines',
+        '/api/user/medicines/today',
+        {'medicines': [ASPIRIN]},
+        '{"medicines": [' + ASPIRIN_JSON + ']}'
+    ),
+    (
+        'get_today_progress',
+        '/api/user/medicines/progress',
+        PROGRESS,
+        PROGRESS_JSON
+    ),
+    (
+        'get_medicine_schedule',
+        '/api/user/medicines/schedule',
+        {'schedule': SCHEDULE, 'start_date': '2025-05-02', 'end_date': '2025-05-03'},
+        '{"schedule": ' + SCHEDULE_JSON + ', "start_date": "2025-05-02", "end_date": "2025-05-03"}'
+    ),
+    (
+        'get_adherence',
+        '/api/user/medicines/adherence',
+        {
+            'period': 'month',
+            'start_date': '2025-05-01',
+            'end_date': '2025-05-03',
+            'periods': [{
+                'period': '2025-05', 'start_date': '2025-05-01', 'end_date': '2025-05-03',
+                'scheduled': 4, 'due': 3, 'taken': 2, 'adherence': 0.6666666666666666,
+                'medicines': [
+                    {'id': str(ASPIRIN_ID), 'name': 'Aspirin', 'scheduled': 3, 'due': 2, 'taken': 2, 'adherence': 1.0},
+                    {'id': str(VITAMIN_ID), 'name': 'Vitamin D', 'scheduled': 1, 'due': 1, 'taken': 0, 'adherence': 0.0}
+                ]
+            }]
+        },
+        '{"period": "month", "start_date": "2025-05-01", "end_date": "2025-05-03", "periods": [{"period": "2025-05", '
+        '"start_date": "2025-05-01", "end_date": "2025-05-03", "scheduled": 4, "due": 3, "taken": 2, '
+        '"adherence": 0.6666666666666666, "medicines": ['
+        '{"id": "6ad2cd306cc579c002466789", "name": "Aspirin", "scheduled": 3, "due": 2, "taken": 2, "adherence": 1.0}, '
+        '{"id": "6ad2cd306cc579c00246678a", "name": "Vitamin D", "scheduled": 1, "due": 1, "taken": 0, "adherence": 0.0}]}]}'
+    ),
+    (
+        'get_dashboard',
+        '/api/user/dashboard',
+        {
+            'today_medicines': [ASPIRIN],
+            'progress': PROGRESS,
+            'schedule': SCHEDULE,
+            'start_date': '2025-05-02',
+            'end_date': '2025-05-03',
+            'medicines': [ASPIRIN, VITAMIN]
+        },
+        '{"today_medicines": [' + ASPIRIN_JSON + '], "progress": ' + PROGRESS_JSON + ', "schedule": ' + SCHEDULE_JSON + ', '
+        '"start_date": "2025-05-02", "end_date": "2025-05-03", "medicines": [' + ASPIRIN_JSON + ', ' + VITAMIN_JSON + ']}'
+    ),
+    (
+        'get_changes',
+        '/api/user/sync',
+        {
+            'version': 3,
+            'full': False,
+            'profile': {'first_name': 'Ann'},
+            'medicines': [VITAMIN],
+            'deleted_medicines': ['6ad2cd306cc579c00246678b'],
+            'dose_events': [{
+                '_id': ObjectId('6ad2cd306cc579c00246678c'), 'medicine_id': str(ASPIRIN_ID),
+                'date': '2025-05-02', 'time': '08:05', 'completed': True, 'version': 3
+            }]
+        },
+        '{"version": 3, "full": false, "profile": {"first_name": "Ann"}, "medicines": [' + VITAMIN_JSON + '], '
+        '"deleted_medicines": ["6ad2cd306cc579c00246678b"], "dose_events": [{"_id": "6ad2cd306cc579c00246678c", '
+        '"medicine_id": "6ad2cd306cc579c002466789", "date": "2025-05-02", "time": "08:05", "completed": true, "version": 3}]}'
+    )
+]
+
+@pytest.fixture
+def client(monkeypatch):
+    app = Flask(__name__)
+    app.config.from_object('app.config.Config')
+    app.json_provider_class = MongoJSONProvider
+    app.json = MongoJSONProvider(app)
+    app.register_blueprint(user_bp, url_prefix='/api/user')
+
+    monkeypatch.setattr(token_utils, 'decode_token', lambda token: {'type': 'access', 'user_id': USER_ID})
+    monkeypatch.setattr(User, 'get_data_version', lambda user_id: 3)
+
+    return app.test_client()
+
+def test_default_provider_is_stdlib(client):
+    assert not client.application.json.use_orjson
+
+@pytest.mark.parametrize('method, path, result, body', ENDPOINTS, ids=[endpoint[0] for endpoint in ENDPOINTS])
+def test_response_bytes_match_baseline(client, monkeypatch, method, path, result, body):
+    monkeypatch.setattr(UserService, method, staticmethod(lambda *args: (True, result, 200)))
+
+    response = client.get(path, headers={'Authorization': 'Bearer token'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.data == body.encode('utf-8')
+
+def test_error_bytes_match_baseline(client, monkeypatch):
+    monkeypatch.setattr(UserService, 'get_user_profile', staticmethod(lambda *args: (False, "User not found", 404)))
+
+    response = client.get('/api/user/profile', headers={'Authorization': 'Bearer token'})
+
+    assert response.status_code == 404
+    assert response.data == b'{"message": "User not found"}'
@@ -0,0 +1,62 @@
+import time
+
+import jwt
+import pytest
+
+from app.config import Config
+from app.models.revoked_token import RevokedToken
+from app.utils import token_utils
+from app.utils.revocation import RevocationList
+from app.utils.token_utils import decode_token, generate_token
+
+USER_ID = '6ad2c9afcbc05b0ea4966538'
+
+@pytest.fixture
+def revocations(monkeypatch):
+    monkeypatch.setattr(RevokedToken, 'revoke_user', lambda user_id, issued_before, expires_at: None)
+    monkeypatch.setattr(RevokedToken, 'revoke_token', lambda jti, user_id, expires_at: None)
+    monkeypatch.setattr(RevokedToken, 'find_since', lambda since=None: [])
+
+    revocations = RevocationList()
+    monkeypatch.setattr(token_utils, 'revocations', revocations)
+    return revocations
+
+def test_login_right_after_revoke_user_is_valid(revocations):
+    before = generate_token(USER_ID, 'access')
+    time.sleep(0.01)
+
+    revocations.revoke_user(USER_ID)
+    after = generate_token(USER_ID, 'access')
+
+    assert decode_token(before) is None
+    assert decode_token(after)['user_id'] == USER_ID
+
+def test_revoke_user_only_revokes_that_user(revocations):
+    other = generate_token('6ad2c9afcbc05b0ea4966539', 'access')
+    time.sleep(0.01)
+
+    revocations.revoke_user(USER_ID)
+
+    assert decode_token(other) is not None
+
+def test_whole_second_iat_of_the_current_second_is_revoked(revocations):
+    # Tokens issued before iat had sub-second precision
+    now = time.time()
+    token = jwt.encode(
+        {'user_id': USER_ID, 'iat': int(now), 'exp': int(now) + 60, 'type': 'access', 'jti': 'legacy'},
+        Config.JWT_SECRET_KEY,
+        algorithm='HS256'
+    )
+
+    revocations.revoke_user(USER_ID)
+
+    assert decode_token(token) is None
+
+def test_revoke_token_only_revokes_that_token(revocations):
+    first = generate_token(USER_ID, 'access')
+    second = generate_token(USER_ID, 'access')
+
+    assert revocations.revoke_token(decode_token(first))
+
+    assert decode_token(first) is None
+    assert decode_token(second) is not None
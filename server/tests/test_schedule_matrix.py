@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.utils.completion_index import CompletionIndex
+from app.utils.medicine import Medicine
+from app.utils.schedule_matrix import ScheduleMatrix
+
+def baseline_schedule(medicines, start_date, end_date):
+    # UserService._generate_schedule before ScheduleMatrix replaced it
+    schedule = {}
+    current_date = datetime.strptime(start_date, '%Y-%m-%d')
+    end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
+
+    while current_date <= end_datetime:
+        date_str = current_date.strftime('%Y-%m-%d')
+        schedule[date_str] = []
+
+        for medicine in medicines:
+            if baseline_is_scheduled(medicine, current_date):
+                schedule[date_str].append({
+                    'id': str(medicine['_id']),
+                    'name': medicine['name'],
+                    'dosage': medicine['dosage'],
+                    'time': medicine['time'],
+                    'completed': any(
+                        entry.get('date') == date_str and entry.get('completed', False)
+                        for entry in medicine.get('history', [])
+                    )
+                })
+
+        schedule[date_str].sort(key=lambda x: x.get('time', '00:00'))
+        current_date += timedelta(days=1)
+
+    return schedule
+
+def baseline_is_scheduled(medicine, date):
+    frequency = medicine.get('frequency', 'daily')
+
+    if frequency == 'daily':
+        return True
+    elif frequency == 'weekly':
+        return date.strftime('%A').lower() in [day.lower() for day in medicine.get('days', [])]
+    elif frequency == 'monthly':
+        return date.day in medicine.get('days_of_month', [])
+    elif frequency == 'specific_dates':
+        return date.strftime('%Y-%m-%d') in medicine.get('dates', [])
+
+    return False
+
+def medicine(name, time, **recurrence):
+    return dict(
+        {'_id': ObjectId(), 'name': name, 'dosage': '1 pill', 'time': time, 'history': []},
+        **recurrence
+    )
+
+MEDICINES = [
+    medicine('Evening', '20:00', frequency='daily', history=[
+        {'date': '2024-02-28', 'time': '20:05', 'completed': True},
+        {'date': '2024-02-29', 'time': '20:05', 'completed': False},
+        {'date': '2024-03-31', 'time': '20:01', 'completed': True}
+    ]),
+    medicine('Weekly', '08:00', frequency='weekly', days=['Monday', 'friday', 'SUNDAY'], history=[
+        {'date': '2024-03-01', 'time': '08:10', 'completed': True},
+        # Not a scheduled day, so never shown
+        {'date': '2024-03-02', 'time': '08:10', 'completed': True}
+    ]),
+    medicine('Month end', '07:30', frequency='monthly', days_of_month=[1, 29, 30, 31]),
+    medicine('Specific', '12:00', frequency='specific_dates', dates=['2024-02-29', '2024-12-31', '2025-01-01']),
+    medicine('Unknown', '09:00', frequency='hourly'),
+    medicine('No frequency', '06:15')
+]
+
+@pytest.mark.parametrize('start_date, end_date', [
+    ('2024-02-01', '2024-03-31'),
+    ('2023-02-20', '2023-03-05'),
+    ('2024-12-25', '2025-01-07'),
+    ('2024-04-30', '2024-04-30'),
+    ('2024-01-01', '2024-12-31')
+])
+def test_schedule_matches_baseline(start_date, end_date):
+    medicines = Medicine.from_documents(MEDICINES)
+    index = CompletionIndex.from_events([], medicines, start_date, end_date)
+
+    schedule = ScheduleMatrix(medicines, start_date, end_date, index).to_schedule()
+
+    assert schedule == baseline_schedule(MEDICINES, start_date, end_date)
+    assert list(schedule) == list(baseline_schedule(MEDICINES, start_date, end_date))
+
+def test_dose_events_complete_scheduled_days():
+    medicines = Medicine.from_documents(MEDICINES[1:2])
+    events = [
+        {'medicine_id': MEDICINES[1]['_id'], 'date': '2024-03-04', 'completed': True},
+        {'medicine_id': MEDICINES[1]['_id'], 'date': '2024-03-08', 'completed': False}
+    ]
+    index = CompletionIndex.from_events(events, medicines, '2024-03-01', '2024-03-10')
+
+    schedule = ScheduleMatrix(medicines, '2024-03-01', '2024-03-10', index).to_schedule()
+
+    completed = {date for date, entries in schedule.items() for entry in entries if entry['completed']}
+    assert completed == {'2024-03-01', '2024-03-04'}
+    assert [date for date, entries in schedule.items() if entries] == [
+        '2024-03-01', '2024-03-03', '2024-03-04', '2024-03-08', '2024-03-10'
+    ]
+
+def test_adherence_counts_due_doses_per_period():
+    documents = [
+        medicine('Daily', '08:00', frequency='daily', history=[
+            {'date': '2024-03-30', 'completed': True},
+            {'date': '2024-04-01', 'completed': True}
+        ]),
+        medicine('Monthly', '09:00', frequency='monthly', days_of_month=[31])
+    ]
+    medicines = Medicine.from_documents(documents)
+    index = CompletionIndex.from_events([], medicines, '2024-03-30', '2024-04-02')
+
+    march, april = ScheduleMatrix(medicines, '2024-03-30', '2024-04-02', index).adherence('month', today='2024-04-01')
+
+    assert (march['period'], march['start_date'], march['end_date']) == ('2024-03', '2024-03-30', '2024-03-31')
+    assert (march['scheduled'], march['due'], march['taken']) == (3, 3, 1)
+    assert (april['scheduled'], april['due'], april['taken']) == (2, 1, 1)
+    assert april['adherence'] == 100.0
+    assert [entry['adherence'] for entry in april['medicines']] == [100.0, None]
+
+def test_period_keys():
+    matrix = ScheduleMatrix([], '2024-12-31', '2025-01-01', CompletionIndex())
+
+    assert matrix.period_keys('month').tolist() == ['2024-12', '2025-01']
+    assert matrix.period_keys('quarter').tolist() == ['2024-Q4', '2025-Q1']
+    assert matrix.period_keys('year').tolist() == ['2024', '2025']
+    with pytest.raises(ValueError):
+        matrix.period_keys('week')